@@ -0,0 +1,364 @@
+# 세 가지 앱(ceo_2/ceo_3/ceo_4)의 성능 측정 (로컬 모의 LLM 서버 사용, 결과는 JSON으로 저장)
+#
+# 실행: python benchmark.py --rows 1000 10000 100000 --streaming-rows 100000 --history 0 20 100 --output benchmark_results.json
+# 측정 항목: 파일 처리 시간/최대 메모리(일반/스트리밍 읽기), 프롬프트 토큰 수, 첫 토큰까지 걸리는 시간, 답변 완료 시간,
+#           대화 이력 N개일 때 전체 재실행 시간, 차트 분류/렌더링 시간
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, replace
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import categorize
+import dataset_store
+import mock_llm_server
+import prompting
+import response_cache
+import router
+import survey_data
+import usage_ledger
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIANTS = ["ceo_2", "ceo_3", "ceo_4"]
+DEFAULT_ROWS = [1000, 10000, 100000]
+# 스트리밍 읽기 경로 측정용 행 수 (파일 크기와 관계없이 기준 크기를 낮춰서 측정)
+DEFAULT_STREAMING_ROWS = [100000]
+DEFAULT_HISTORY = [0, 20, 100]
+DEFAULT_REPEAT = 3
+DEFAULT_CHART_ROWS = 1000
+RERUN_TIMEOUT_SECONDS = 120
+
+# 측정용 질문 (전체 데이터를 쓰는 질문과 검색으로 일부만 쓰는 질문)
+BENCH_QUERIES = {
+    "global": "전체 질문을 요약해줘",
+    "retrieved": "복지와 휴가 제도에 대한 질문 알려줘",
+}
+CHART_QUERY = "질문 카테고리 차트로 보여줘"
+
+# 가상 질문 데이터 생성용 문장
+QUESTION_TEMPLATES = [
+    "회사의 {0} 비전은 무엇인가요?",
+    "신입사원이 {0} 역량을 키우려면 어떻게 해야 하나요?",
+    "CEO님은 {0}에 대해 어떻게 생각하시나요?",
+    "{0} 관련 복지 제도가 궁금합니다.",
+    "{0} 분야에서 신입사원에게 기대하시는 점은 무엇인가요?",
+    "입사 후 {0} 업무를 배우려면 어떤 준비가 필요할까요?",
+]
+QUESTION_TOPICS = ["디지털", "글로벌", "데이터", "고객 경험", "조직 문화", "휴가", "교육", "리더십", "결제", "보안"]
+
+# 차트 이력 메시지에 넣을 1x1 PNG 이미지
+HISTORY_IMAGE = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)).decode("utf-8")
+
+
+class BenchUpload:
+    """st.file_uploader 결과와 같은 방식(name, getvalue)으로 사용하는 업로드 파일"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+def make_csv(rows: int, seed: int = 0) -> bytes:
+    """작성자/질문 컬럼을 가진 가상 설문 CSV 생성"""
+    rng = random.Random(seed)
+    authors = max(rows // 5, 1)
+    df = pd.DataFrame({
+        "번호": range(1, rows + 1),
+        "이름": [f"사원{rng.randrange(authors):05d}" for _ in range(rows)],
+        "질문": [rng.choice(QUESTION_TEMPLATES).format(rng.choice(QUESTION_TOPICS)) for _ in range(rows)],
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def make_history(count: int) -> list:
+    """대화 이력 메시지 생성 (답변 10개마다 차트 이미지 포함)"""
+    messages = []
+    for idx in range(count):
+        is_human = idx % 2 == 0
+        messages.append({
+            "message": f"질문 {idx}: 신입사원들이 가장 궁금해하는 점은?" if is_human else "답변 내용입니다. " * 40,
+            "role": "human" if is_human else "assistant",
+            "timestamp": "",
+            "image": HISTORY_IMAGE if not is_human and idx % 20 == 1 else None
+        })
+    return messages
+
+
+def _median(values: list) -> float:
+    return round(statistics.median(values), 4)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _prepare_workdir(base_url: str) -> str:
+    """모의 서버 주소를 담은 secrets.toml과 빈 캐시/저장소가 있는 작업 폴더 생성"""
+    workdir = tempfile.mkdtemp(prefix="benchmark_")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+        f.write(f'llm_base_url = "{base_url}"\n')
+    # 실제 응답 캐시, 데이터셋 저장소, 사용량 장부에 측정용 데이터가 섞이지 않도록 분리
+    response_cache.CACHE_PATH = os.path.join(workdir, "response_cache.sqlite3")
+    dataset_store.STORE_DIR = os.path.join(workdir, "dataset_store")
+    usage_ledger.LEDGER_PATH = os.path.join(workdir, "usage_ledger.sqlite3")
+    os.chdir(workdir)
+    return workdir
+
+
+def _reset_ingestion(workdir: str):
+    """파싱 캐시와 데이터셋 저장소를 비워 처음 업로드한 상태로 되돌림"""
+    st.cache_data.clear()
+    dataset_store.STORE_DIR = tempfile.mkdtemp(prefix="store_", dir=workdir)
+    st.session_state.dataset = None
+
+
+def _reset_session(module):
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    module.initialize_session_state()
+
+
+def load_variant(name: str):
+    """앱 스크립트를 모듈로 불러오기 (main은 실행하지 않음)"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure_ingestion(module, workdir: str, rows_list: list, repeat: int, streaming: bool = False):
+    """analyze_uploaded_file 처리 시간과 최대 메모리 (캐시/저장소를 비운 첫 업로드 기준)"""
+    threshold = survey_data.STREAMING_THRESHOLD_BYTES
+    if streaming:
+        # 측정용 파일은 기준 크기보다 작으므로 기준을 낮춰 스트리밍 경로로 읽게 함
+        survey_data.STREAMING_THRESHOLD_BYTES = 0
+    try:
+        return _measure_ingestion(module, workdir, rows_list, repeat)
+    finally:
+        survey_data.STREAMING_THRESHOLD_BYTES = threshold
+
+
+def _measure_ingestion(module, workdir: str, rows_list: list, repeat: int):
+    results, datasets = [], {}
+    for rows in rows_list:
+        upload = BenchUpload(f"bench_{rows}.csv", make_csv(rows))
+        seconds = []
+        for _ in range(repeat):
+            _reset_ingestion(workdir)
+            start = time.perf_counter()
+            dataset = module.analyze_uploaded_file(upload)
+            seconds.append(time.perf_counter() - start)
+
+        _reset_ingestion(workdir)
+        tracemalloc.start()
+        module.analyze_uploaded_file(upload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            "rows": rows,
+            "bytes": len(upload.getvalue()),
+            "path": "streaming" if len(upload.getvalue()) >= survey_data.STREAMING_THRESHOLD_BYTES else "in_memory",
+            "seconds": _median(seconds),
+            "peak_memory_mb": round(peak / 1024 / 1024, 2),
+            "ok": dataset is not None
+        })
+        if dataset is not None:
+            datasets[rows] = dataset
+    return results, datasets
+
+
+def measure_prompt_tokens(module, datasets: dict):
+    """일반 질문 프롬프트의 토큰 수와 생성 시간"""
+    results = []
+    for rows, dataset in datasets.items():
+        for label, query in BENCH_QUERIES.items():
+            start = time.perf_counter()
+            messages = module.build_general_messages(query, dataset)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "rows": rows,
+                "query": label,
+                "tokens": sum(prompting.count_tokens(message["content"]) for message in messages),
+                "build_seconds": round(elapsed, 4)
+            })
+    return results
+
+
+def measure_llm(module, dataset, repeat: int):
+    """첫 토큰까지 걸리는 시간, 스트리밍 완료 시간, 화면 표시를 포함한 답변 완료 시간"""
+    ttft, stream_seconds, answer_seconds = [], [], []
+    query = BENCH_QUERIES["retrieved"]
+    for idx in range(repeat):
+        messages = module.build_general_messages(query, dataset)
+        start = time.perf_counter()
+        stream = st.session_state.client.chat.completions.create(
+            model=module.LLM_MODEL, messages=messages, temperature=0.0, stream=True
+        )
+        first = None
+        for chunk in stream:
+            if first is None and chunk.choices and chunk.choices[0].delta.content:
+                first = time.perf_counter() - start
+        stream_seconds.append(time.perf_counter() - start)
+        ttft.append(first or stream_seconds[-1])
+
+        # 응답 캐시에 걸리지 않도록 매번 다른 숫자가 들어간 질문 사용
+        numbered_query = f"{query} {idx + 1}번째"
+        route = router.route_query(numbered_query, dataset, module.LLM_MODELS)
+        start = time.perf_counter()
+        module.analyze_text_with_context(numbered_query, dataset, route)
+        answer_seconds.append(time.perf_counter() - start)
+    return {
+        "ttft_seconds": _median(ttft),
+        "stream_seconds": _median(stream_seconds),
+        "answer_seconds": _median(answer_seconds)
+    }
+
+
+def measure_chart(module, dataset, repeat: int):
+    """차트 분류(모의 서버) 시간과 라벨이 있을 때의 차트 생성/이미지 변환 시간"""
+    model = module.LLM_MODELS[router.MODEL_SMALL]
+    response_cache.CACHE_PATH = os.path.join(tempfile.mkdtemp(), "response_cache.sqlite3")
+    start = time.perf_counter()
+    categories, labels = categorize.label_dataset(
+        st.session_state.client, model=model, system_prompt="당신은 데이터 분석 전문가입니다.", dataset=dataset
+    )
+    label_seconds = time.perf_counter() - start
+
+    labeled = replace(dataset, categories=categories, labels=labels)
+    route = router.Route(intent=router.INTENT_CHART, model=model)
+    seconds, ok = [], True
+    for _ in range(repeat):
+        st.session_state.dataset = labeled
+        start = time.perf_counter()
+        ok = module.analyze_text_with_context(CHART_QUERY, labeled, route) is not None and ok
+        seconds.append(time.perf_counter() - start)
+    # 차트 생성이 실패하면(kaleido 없음 등) 실패한 실행 시간은 기록하지 않음
+    return {
+        "rows": len(dataset),
+        "label_seconds": round(label_seconds, 4),
+        "render_seconds": _median(seconds) if ok else None,
+        "ok": ok
+    }
+
+
+def measure_rerun(name: str, dataset, base_url: str, history_sizes: list, repeat: int):
+    """대화 이력이 N개일 때 스크립트 전체 재실행 시간 (첫 실행은 준비 과정으로 제외)"""
+    results = []
+    for count in history_sizes:
+        app = AppTest.from_file(os.path.join(SCRIPT_DIR, f"{name}.py"), default_timeout=RERUN_TIMEOUT_SECONDS)
+        app.secrets["llm_base_url"] = base_url
+        app.session_state["messages"] = make_history(count)
+        app.session_state["dataset"] = dataset
+        app.run()
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.run()
+            seconds.append(time.perf_counter() - start)
+        results.append({
+            "history_messages": count,
+            "seconds": _median(seconds),
+            "ok": not app.exception
+        })
+    return results
+
+
+def run_variant(name: str, workdir: str, base_url: str, args) -> dict:
+    print(f"[benchmark] {name}")
+    module = load_variant(name)
+    _reset_session(module)
+
+    ingestion, datasets = measure_ingestion(module, workdir, args.rows, args.repeat)
+    if args.streaming_rows:
+        ingestion += measure_ingestion(module, workdir, args.streaming_rows, args.repeat, streaming=True)[0]
+        _reset_ingestion(workdir)
+    result = {"ingestion": ingestion, "prompt_tokens": measure_prompt_tokens(module, datasets)}
+    if not datasets:
+        return result
+
+    smallest = datasets[min(datasets)]
+    chart_dataset = datasets.get(args.chart_rows) or module.analyze_uploaded_file(
+        BenchUpload(f"bench_{args.chart_rows}.csv", make_csv(args.chart_rows))
+    ) or smallest
+    _reset_session(module)
+    result["llm"] = measure_llm(module, smallest, args.repeat)
+    result["chart"] = measure_chart(module, chart_dataset, args.repeat)
+    result["rerun"] = measure_rerun(name, smallest, base_url, args.history, args.repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ceo_2/ceo_3/ceo_4 성능 측정")
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--rows", nargs="+", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--streaming-rows", nargs="*", type=int, default=DEFAULT_STREAMING_ROWS,
+                        help="스트리밍 읽기 경로로 측정할 행 수 (비우면 측정하지 않음)")
+    parser.add_argument("--history", nargs="+", type=int, default=DEFAULT_HISTORY)
+    parser.add_argument("--chart-rows", type=int, default=DEFAULT_CHART_ROWS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--ttft", type=float, default=0.2, help="모의 서버의 첫 토큰까지 걸리는 시간(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--output", default=os.path.join(SCRIPT_DIR, "benchmark_results.json"))
+    args = parser.parse_args()
+    args.output = os.path.abspath(args.output)
+
+    config = mock_llm_server.MockConfig(
+        ttft_seconds=args.ttft, tokens_per_second=args.tokens_per_second, response_tokens=args.response_tokens
+    )
+    server, base_url = mock_llm_server.start_in_thread(config)
+    workdir = _prepare_workdir(base_url)
+    sys.path.insert(0, SCRIPT_DIR)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "streamlit": st.__version__,
+            "mock_server": asdict(config),
+            "repeat": args.repeat
+        },
+        "results": {}
+    }
+    try:
+        for name in args.variants:
+            report["results"][name] = run_variant(name, workdir, base_url, args)
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[benchmark] results: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
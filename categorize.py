@@ -0,0 +1,424 @@
+import contextvars
+import json
+import random
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import prompting
+import response_cache
+
+# 차트 분류 설정
+CATEGORY_COUNT = 5
+SAMPLE_SIZE = 200
+BATCH_SIZE = 100
+MAX_WORKERS = 4
+UNCLASSIFIED_LABEL = "기타"
+
+# 분류 프롬프트 버전 (프롬프트를 수정하면 버전을 올려 캐시된 응답을 무효화)
+PROMPT_VERSION = "chart-1"
+
+
+# 배열 항목 뒤에 올 수 있는 문자
+ARRAY_DELIMITERS = ",] \t\r\n"
+
+
+class JsonArrayStream:
+    """스트리밍 중인 JSON 응답에서 지정한 키의 배열 항목을 완성되는 대로 추출"""
+
+    _separator = re.compile(r"[\s,]*")
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, text: str) -> list:
+        """받은 조각을 이어 붙이고 새로 완성된 항목 반환"""
+        self._buffer += text
+        items = []
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return items
+            self._pos = match.end()
+        while not self.done:
+            pos = self._separator.match(self._buffer, self._pos).end()
+            if pos >= len(self._buffer):
+                break
+            if self._buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                break
+            # 숫자는 뒤에 자릿수가 더 올 수 있으므로("3." → "3.14") 구분자(쉼표, 닫는 괄호, 공백)가 도착한 뒤 확정
+            if not isinstance(item, (str, list, dict)) and (
+                end >= len(self._buffer) or self._buffer[end] not in ARRAY_DELIMITERS
+            ):
+                break
+            items.append(item)
+            self._pos = end
+        return items
+
+
+def _close_json(text: str):
+    """잘린 JSON의 열린 문자열/괄호를 닫은 문자열 (괄호 짝이 맞지 않으면 None)"""
+    stack = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack or stack.pop() != ch:
+                return None
+    if in_string:
+        text += '"'
+    return text + "".join(reversed(stack))
+
+
+def parse_json(content: str):
+    """JSON 응답 파싱 (코드 블록, 앞뒤 텍스트, 끝의 쉼표, 잘린 응답은 로컬에서 복구, 실패하면 None)"""
+    text = re.sub(r"^```(?:json)?|```$", "", (content or "").strip()).strip()
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = re.sub(r",\s*([}\]])", r"\1", text[start:])
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(text)[0]
+    except json.JSONDecodeError:
+        pass
+
+    # 잘린 응답은 마지막 항목을 하나씩 버리면서 괄호를 닫아 복구
+    for _ in range(3):
+        closed = _close_json(text)
+        if closed is not None:
+            try:
+                return json.loads(re.sub(r",\s*([}\]])", r"\1", closed))
+            except json.JSONDecodeError:
+                pass
+        cut = text.rfind(",")
+        if cut <= 0:
+            return None
+        text = text[:cut]
+    return None
+
+
+def _complete(client, model: str, messages: list, label: str, stream_key: str = None, on_item=None) -> str:
+    """JSON 모드 요청 후 응답 본문 반환 (on_item을 지정하면 스트리밍으로 받으면서 배열 항목 전달)"""
+    prompting.log_prompt_size(label, messages)
+    if on_item is None:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.0,
+            response_format={"type": "json_object"},
+            stream=False
+        )
+        prompting.log_usage(label, response.usage)
+        return response.choices[0].message.content
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.0,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    parser = JsonArrayStream(stream_key)
+    parts = []
+    for delta in prompting.stream_deltas(response, label):
+        parts.append(delta)
+        for item in parser.feed(delta):
+            on_item(item)
+    return "".join(parts)
+
+
+def request_json(client, model: str, system_prompt: str, prompt: str, label: str, stream_key: str = None, on_item=None, validate=None, schema: str = "") -> dict:
+    """JSON 모드로 요청하고 응답을 파싱 (같은 프롬프트는 캐시된 응답 사용)
+
+    on_item을 지정하면 응답을 스트리밍으로 받아 stream_key 배열의 항목을 도착하는 대로 전달
+    validate를 지정하면 형식을 검사하고, 로컬 복구로도 맞지 않을 때만 schema 예시로 짧은 수정 요청
+    """
+    # 프롬프트에 데이터가 포함되어 있으므로 프롬프트 전체를 키로 사용
+    cache_key = response_cache.make_key("", f"{system_prompt}\n{prompt}", model, PROMPT_VERSION)
+    content = response_cache.get(cache_key)
+    if content is None:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        content = _complete(client, model, messages, label, stream_key, on_item)
+    elif on_item is not None:
+        for item in JsonArrayStream(stream_key).feed(content):
+            on_item(item)
+
+    result = parse_json(content)
+    is_valid = result is not None and (validate is None or validate(result))
+    if not is_valid and schema:
+        # 데이터는 다시 보내지 않고 잘못된 응답만 고치도록 요청
+        print(f"JSON repair request: {label}")
+        repair_prompt = f"""
+    아래 응답을 다음 JSON 형식에 맞게 고쳐주세요. 내용은 바꾸지 말고 형식만 고쳐주세요.
+
+    형식:
+    {schema}
+
+    응답:
+{content}
+    """
+        repair_messages = [
+            {"role": "system", "content": "당신은 JSON 형식을 고치는 도우미입니다."},
+            {"role": "user", "content": repair_prompt}
+        ]
+        result = parse_json(_complete(client, model, repair_messages, f"{label}-repair"))
+        is_valid = result is not None and (validate is None or validate(result))
+    if not is_valid:
+        raise ValueError(f"{label} 응답이 올바른 JSON 형식이 아닙니다.")
+
+    response_cache.put(cache_key, json.dumps(result, ensure_ascii=False), model=model, prompt_version=PROMPT_VERSION)
+    return result
+
+
+def _has_categories(result) -> bool:
+    categories = result.get("categories") if isinstance(result, dict) else None
+    return isinstance(categories, list) and any(str(category).strip() for category in categories)
+
+
+def _has_labels(result) -> bool:
+    return isinstance(result, dict) and isinstance(result.get("labels"), dict)
+
+
+def _question_rows(dataset) -> list:
+    """내용이 있는 질문의 행 번호 목록"""
+    return [idx for idx, question in enumerate(dataset.questions) if question.strip()]
+
+
+def derive_categories(client, model: str, system_prompt: str, dataset, row_ids: list, token_budget: int, on_category=None) -> list:
+    """표본 질문으로 카테고리 5개 도출 (on_category를 지정하면 카테고리가 도착하는 대로 목록 전달)"""
+    sample_ids = row_ids
+    if len(row_ids) > SAMPLE_SIZE:
+        # 같은 데이터셋이면 같은 표본이 나오도록 데이터셋 키로 시드 고정
+        sample_ids = sorted(random.Random(dataset.key).sample(row_ids, SAMPLE_SIZE))
+    encoded = prompting.encode_rows(dataset, sample_ids, include_authors=False, token_budget=token_budget)
+
+    prompt = f"""
+    아래는 신한카드 신입사원들이 CEO에게 한 질문 중 일부입니다.
+    전체 질문을 분류할 수 있는 카테고리를 정확히 {CATEGORY_COUNT}개 만들어주세요.
+
+    데이터 (한 줄에 질문 하나, 탭으로 구분):
+{encoded.text}
+
+    다음과 같은 JSON 형식으로 반환해주세요:
+    {{"categories": ["카테고리1", "카테고리2", "카테고리3", "카테고리4", "카테고리5"]}}
+
+    규칙:
+    1. 카테고리 이름은 짧고 서로 겹치지 않게 작성해주세요
+    2. JSON 형식 외의 다른 텍스트는 포함하지 마세요
+    """
+    found = []
+
+    def collect(category):
+        name = str(category).strip()
+        if name and name not in found and len(found) < CATEGORY_COUNT:
+            found.append(name)
+            on_category(list(found))
+
+    result = request_json(
+        client, model, system_prompt, prompt, "chart-categories",
+        stream_key="categories", on_item=collect if on_category else None,
+        validate=_has_categories, schema='{"categories": ["카테고리1", "카테고리2"]}'
+    )
+    categories = [str(category).strip() for category in result["categories"] if str(category).strip()]
+    return list(dict.fromkeys(categories))[:CATEGORY_COUNT]
+
+
+def classify_batch(client, model: str, system_prompt: str, dataset, row_ids: list, categories: list, token_budget: int) -> dict:
+    """질문 묶음을 카테고리로 분류 ({행 번호: 카테고리})"""
+    encoded = prompting.encode_rows(dataset, row_ids, include_authors=False, token_budget=token_budget)
+    category_lines = '\n'.join(f"{number}. {category}" for number, category in enumerate(categories, 1))
+
+    prompt = f"""
+    아래 질문들을 주어진 카테고리 중 하나로 분류해주세요.
+
+    카테고리:
+{category_lines}
+
+    데이터 (한 줄에 질문 하나, 탭으로 구분):
+{encoded.text}
+
+    다음과 같은 JSON 형식으로 반환해주세요 (키는 질문 번호, 값은 카테고리 번호):
+    {{"labels": {{"1": 2, "2": 5}}}}
+
+    규칙:
+    1. 모든 질문 번호를 빠짐없이 포함해주세요
+    2. JSON 형식 외의 다른 텍스트는 포함하지 마세요
+    """
+    try:
+        result = request_json(
+            client, model, system_prompt, prompt, "chart-classify",
+            validate=_has_labels, schema='{"labels": {"질문 번호": 카테고리 번호}}'
+        )
+    except ValueError as e:
+        # 실패한 묶음은 누락된 질문으로 처리되어 한 번 더 분류됨
+        print(f"Chart classify error: {str(e)}")
+        return {}
+
+    labels = {}
+    for question_number, category_number in result.get("labels", {}).items():
+        try:
+            row_id = int(question_number) - 1
+            # 번호 대신 카테고리 이름으로 답한 경우도 인정
+            if category_number in categories:
+                category_index = categories.index(category_number)
+            else:
+                category_index = int(category_number) - 1
+        except (TypeError, ValueError):
+            continue
+        if row_id in row_ids and 0 <= category_index < len(categories):
+            labels[row_id] = categories[category_index]
+    return labels
+
+
+def classify_dataset(client, model: str, system_prompt: str, dataset, row_ids: list, categories: list, token_budget: int, on_batch=None) -> dict:
+    """질문을 BATCH_SIZE 단위로 나눠 병렬로 분류 (on_batch를 지정하면 묶음이 끝날 때마다 누적 결과 전달)"""
+    batches = [row_ids[start:start + BATCH_SIZE] for start in range(0, len(row_ids), BATCH_SIZE)]
+    labels = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # 사용량 장부의 세션/데이터셋 정보가 작업 스레드에도 전달되도록 컨텍스트 복사
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                classify_batch, client, model, system_prompt, dataset, batch, categories, token_budget
+            )
+            for batch in batches
+        ]
+        # 화면 갱신은 호출한 스레드에서 하도록 완료된 순서대로 결과를 받아 전달
+        for future in as_completed(futures):
+            labels.update(future.result())
+            if on_batch:
+                on_batch(labels)
+    return labels
+
+
+def _percentages(counts: list, total: int) -> list:
+    """소수점 한 자리 비율 계산 (합이 정확히 100.0이 되도록 최대 잔여 방식으로 보정)"""
+    if not total:
+        return [0.0] * len(counts)
+    raw = [count * 1000 / total for count in counts]
+    tenths = [int(value) for value in raw]
+    order = sorted(range(len(raw)), key=lambda idx: raw[idx] - tenths[idx], reverse=True)
+    for idx in order[:1000 - sum(tenths)]:
+        tenths[idx] += 1
+    return [value / 10 for value in tenths]
+
+
+def summarize_labels(labels: list, categories: list) -> list:
+    """행별 카테고리로 카테고리별 개수와 비율 계산"""
+    counts = pd.Series(labels, dtype="object").value_counts()
+    names = list(categories)
+    if UNCLASSIFIED_LABEL in counts.index and UNCLASSIFIED_LABEL not in names:
+        names.append(UNCLASSIFIED_LABEL)
+    counts = counts.reindex(names, fill_value=0).sort_values(ascending=False, kind="stable")
+
+    percentages = _percentages(counts.tolist(), len(labels))
+    return [
+        {"category": category, "count": int(count), "percentage": percentage}
+        for (category, count), percentage in zip(counts.items(), percentages)
+    ]
+
+
+def label_dataset(client, model: str, system_prompt: str, dataset, token_budget: int = prompting.DEFAULT_TOKEN_BUDGET, on_progress=None):
+    """카테고리 도출 → 묶음별 병렬 분류 (카테고리 목록과 행별 라벨 반환, 빈 질문은 빈 문자열)
+
+    on_progress를 지정하면 카테고리 도착/묶음 완료 때마다 (카테고리 목록, 현재까지의 행별 라벨, 전체 질문 수) 전달
+    """
+    row_ids = _question_rows(dataset)
+    on_category = (lambda categories: on_progress(categories, {}, len(row_ids))) if on_progress else None
+    categories = derive_categories(client, model, system_prompt, dataset, row_ids, token_budget, on_category)
+    on_batch = (lambda labels_by_row: on_progress(categories, labels_by_row, len(row_ids))) if on_progress else None
+    labels_by_row = classify_dataset(client, model, system_prompt, dataset, row_ids, categories, token_budget, on_batch)
+
+    # 응답에서 누락된 질문은 한 번 더 분류하고, 그래도 없으면 기타로 집계
+    missing = [row_id for row_id in row_ids if row_id not in labels_by_row]
+    if missing:
+        labels_by_row.update(classify_dataset(client, model, system_prompt, dataset, missing, categories, token_budget))
+    for row_id in row_ids:
+        labels_by_row.setdefault(row_id, UNCLASSIFIED_LABEL)
+
+    labels = tuple(labels_by_row.get(row_id, "") for row_id in range(len(dataset)))
+    return tuple(categories), labels
+
+
+def format_progress(categories: list, labels_by_row: dict, total: int) -> str:
+    """분류 진행 상황 (도착한 카테고리와 현재까지 분류된 질문 수)"""
+    counts = Counter(labels_by_row.values())
+    lines = [f"#### 질문 분류 중... ({len(labels_by_row)}/{total})"]
+    lines += [f"- **{category}**: {counts.get(category, 0)}개" for category in categories]
+    return '\n'.join(lines)
+
+
+def _labeled_frame(dataset):
+    """분류된 질문의 작성자/질문/카테고리 DataFrame"""
+    df = pd.DataFrame({
+        "author": list(dataset.authors),
+        "question": list(dataset.questions),
+        "category": list(dataset.labels)
+    })
+    return df[df["category"] != ""]
+
+
+def summarize_dataset(dataset) -> dict:
+    """저장된 라벨로 차트 결과 생성 (API 호출 없음)"""
+    labels = _labeled_frame(dataset)["category"].tolist()
+    return {
+        "answer": f"신입사원들의 질문 {len(labels)}개를 {len(dataset.categories)}개 카테고리로 분석한 결과입니다.",
+        "categories": summarize_labels(labels, dataset.categories)
+    }
+
+
+def format_breakdown(dataset, query: str, max_rows: int = 30):
+    """저장된 라벨로 카테고리별 질문 목록 또는 작성자별 분포 작성 (해당 없으면 None)"""
+    df = _labeled_frame(dataset)
+
+    # 카테고리 이름이 포함된 질문이면 해당 카테고리 질문 목록
+    names = sorted(set(dataset.categories) | set(df["category"]), key=len, reverse=True)
+    for category in names:
+        if category in query:
+            questions = df.loc[df["category"] == category, "question"].tolist()
+            lines = [f"#### {category} ({len(questions)}개)"]
+            lines += [f"{number}. {question}" for number, question in enumerate(questions[:max_rows], 1)]
+            if len(questions) > max_rows:
+                lines.append(f"\n외 {len(questions) - max_rows}개")
+            return '\n'.join(lines)
+
+    # 작성자별 분포
+    if '작성자' in query and (df["author"] != "").any():
+        table = pd.crosstab(df.loc[df["author"] != "", "author"], df["category"])
+        table = table.loc[table.sum(axis=1).sort_values(ascending=False, kind="stable").index[:max_rows]]
+        lines = [
+            "#### 작성자별 카테고리 분포",
+            "| 작성자 | " + " | ".join(table.columns) + " |",
+            "|---" * (len(table.columns) + 1) + "|"
+        ]
+        for author, row in table.iterrows():
+            lines.append(f"| {author} | " + " | ".join(str(int(value)) for value in row) + " |")
+        return '\n'.join(lines)
+
+    return None
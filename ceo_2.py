@@ -1,17 +1,47 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import json
-from openai import OpenAI
 import base64
 from pathlib import Path
 import os
 import plotly.express as px
 import plotly.graph_objects as go
 import time
-
-# API 키 설정
-llm_api_key = st.secrets["llm_api_key"]
+from dataclasses import replace
+
+import categorize
+import conversation
+import llm_client
+import prompting
+import rendering
+import response_cache
+import retrieval
+import router
+import survey_data
+import survey_stats
+import telemetry
+import usage_ledger
+import topics
+
+# API 키 설정 (llm_base_url로 로컬 모의 서버를 지정하면 키 없이 실행 가능)
+llm_api_key = llm_client.api_key()
+
+# 모델 및 프롬프트 버전 (프롬프트를 수정하면 버전을 올려 캐시된 응답을 무효화)
+LLM_MODEL = "gpt-4o"
+PROMPT_VERSION = "ceo_2-4"
+SYSTEM_PROMPT = "당신은 CEO와 신입사원간의 커뮤니케이션을 돕는 챗봇입니다. 사용자의 질문이 신입사원들이 CEO에게 물어보는 것과 관련된 질문일 경우 업로드된 파일 바탕으로 답변하며, 그 외 일반적인 질문에 대해선 자연스럽게 알고 있는 사실을 답변합니다. 절대 없는 내용을 임의로 만들어서 답변하지 않습니다. "
+
+# 프롬프트 데이터 설정 (토큰 예산, 작성자 포함 여부)
+PROMPT_TOKEN_BUDGET = int(llm_client.secret("prompt_token_budget", prompting.DEFAULT_TOKEN_BUDGET))
+PROMPT_INCLUDE_AUTHORS = bool(llm_client.secret("prompt_include_authors", True))
+RETRIEVAL_TOP_K = int(llm_client.secret("retrieval_top_k", retrieval.DEFAULT_TOP_K))
+HISTORY_TOKEN_BUDGET = int(llm_client.secret("history_token_budget", conversation.DEFAULT_HISTORY_TOKEN_BUDGET))
+
+# 완성된 답변을 보여주는 총 시간(초, 0이면 바로 표시)
+REVEAL_SECONDS = float(llm_client.secret("reveal_seconds", rendering.DEFAULT_REVEAL_SECONDS))
+
+# 질문 유형별 모델 (통계/차트/간단한 질문은 작은 모델, 주제 요약/복잡한 질문은 큰 모델)
+LLM_MODELS = {router.MODEL_SMALL: "gpt-4o-mini", router.MODEL_LARGE: LLM_MODEL}
 
 # 현재 스크립트의 디렉토리를 기준으로 assets 폴더 경로 설정
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -98,314 +128,290 @@ def initialize_session_state():
     """세션 상태 초기화"""
     if 'messages' not in st.session_state:
         st.session_state.messages = []
-    if 'file_data' not in st.session_state:
-        st.session_state.file_data = None
-    if 'data_list' not in st.session_state:
-        st.session_state.data_list = None
+    if 'dataset' not in st.session_state:
+        st.session_state.dataset = None
     if 'client' not in st.session_state:
-        st.session_state.client = OpenAI(api_key=llm_api_key)
+        # 프로세스 전체에서 공유하는 클라이언트 (연결 풀, 동시 요청 한도, 재시도)
+        st.session_state.client = llm_client.get_client(llm_api_key)
 
+@telemetry.traced("upload")
 def analyze_uploaded_file(file):
     """업로드된 파일 분석"""
     try:
-        if file.name.endswith('.csv'):
-            df = pd.read_csv(file)
-        elif file.name.endswith('.xlsx'):
-            df = pd.read_excel(file)
-        else:
+        if not file.name.endswith(('.csv', '.xlsx')):
             st.error("지원하지 않는 파일 형식입니다.")
-            return None, None, None
-
-        text_columns = [col for col in df.columns if df[col].dtype == 'object']
+            return None
+
+        # 파일 내용 해시 기준으로 캐시된 파싱 결과 사용
+        file_bytes = file.getvalue()
+        file_hash = survey_data.file_digest(file_bytes)
+        is_large_file = len(file_bytes) >= survey_data.STREAMING_THRESHOLD_BYTES
+        # 헤더와 앞부분 표본만 읽어 컬럼 확인 (전체 파싱은 데이터셋 생성 시 한 번만)
+        text_columns = survey_data.sniff_text_columns(file_hash, file.name, file_bytes)
         if not text_columns:
             st.error("텍스트 데이터를 포함한 컬럼을 찾을 수 없습니다.")
-            return None, None, None
+            return None
 
         # 고정된 컬럼명 사용
         author_col = "이름"  # 고정된 작성자 컬럼명
         question_col = "질문"  # 고정된 질문 컬럼명
 
-        # 데이터 리스트 생성
-        data_list = []
-        for idx, row in df.iterrows():
-            author = row[author_col] if not pd.isna(row[author_col]) else ""
-            question_text = row[question_col] if not pd.isna(row[question_col]) else ""
-            data_list.append({
-                "author": str(author),
-                "question": str(question_text)
-            })
+        if is_large_file:
+            # 이미 읽어둔 데이터셋이면 재사용
+            dataset_key = survey_data.dataset_key(file_hash, author_col, question_col)
+            if st.session_state.dataset is not None and st.session_state.dataset.key == dataset_key:
+                return st.session_state.dataset
+
+            progress_bar = st.progress(0.0, text="대용량 파일을 읽는 중입니다...")
+            dataset = survey_data.stream_dataset(
+                file_hash, file.name, author_col, question_col, file_bytes,
+                on_progress=lambda progress: progress_bar.progress(progress, text="대용량 파일을 읽는 중입니다...")
+            )
+            progress_bar.empty()
+            return dataset
 
-        # 분석용 텍스트 데이터
-        text_data = '\n'.join(df[question_col].dropna().astype(str).tolist())
-        return text_data, data_list, df
+        return survey_data.build_dataset(
+            file_hash, file.name, author_col, question_col, file_bytes
+        )
 
     except Exception as e:
         st.error(f"파일 처리 중 오류가 발생했습니다: {str(e)}")
-        return None, None, None
+        return None
+
+@telemetry.traced("prompt_build")
+def build_general_messages(text_query: str, dataset: survey_data.SurveyDataset, history: list = ()) -> list:
+    """일반 질문용 메시지 생성 (이전 대화는 고정된 앞부분과 질문 사이에 배치)"""
+    # 데이터셋마다 같은 지시사항/규칙/데이터를 앞에 두고 매번 바뀌는 질문은 마지막 메시지로 분리
+    # (같은 데이터셋에 대한 반복 질문은 API의 프롬프트 캐시로 처리되어 첫 토큰이 빨라짐)
+    # 기초 통계와 작성자 목록도 토큰 예산에 포함 (작성자는 질문 수 상위 일부만, 작성자별 질문은 로컬 통계로 답변)
+    prefix = f"""
+    당신은 데이터 분석 전문가이자 신한카드 CEO와 신입사원들 간의 소통을 돕는 AI 어시스턴트입니다.
+    질문에는 자연스러운 대화체로 답변해주세요.
+
+    규칙:
+    1. 데이터에 없는 내용은 절대 추측하지 마세요
+    2. 답변은 항상 완전한 형태로 제공하세요 (중간에 '...' 등으로 생략하지 않음)
+
+    기초 데이터:
+    - 포함된 필드: {', '.join(prompting.row_fields(PROMPT_INCLUDE_AUTHORS))}
+
+    데이터 (한 줄에 질문 하나, 탭으로 구분):
+"""
+    # 고정 문구/기초 통계, 이전 대화 예산, 질문 몫을 뺀 나머지 토큰만 데이터 행에 사용
+    data_budget = prompting.data_token_budget(prefix, text_query, HISTORY_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET)
+
+    # 질문과 관련된 데이터만 선택 (전체 현황을 묻는 질문이면 전체 데이터 사용)
+    index = retrieval.build_index(dataset.key, dataset)
+    relevant_rows = retrieval.select_relevant_rows(index, text_query, top_k=RETRIEVAL_TOP_K)
+    if relevant_rows is None:
+        encoded = prompting.encode_dataset(
+            dataset.key, dataset, include_authors=PROMPT_INCLUDE_AUTHORS, token_budget=data_budget
+        )
+    else:
+        encoded = prompting.encode_rows(
+            dataset, relevant_rows, include_authors=PROMPT_INCLUDE_AUTHORS,
+            token_budget=data_budget, is_retrieved=True
+        )
 
-def analyze_text_with_context(text_query: str, file_data: str, data_list: list):
+    system_prompt = prefix + f"""{encoded.text}
+    {prompting.truncation_note(encoded)}
+    """
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *history,
+        {"role": "user", "content": text_query}
+    ]
+    prompting.log_prompt_size("general", messages)
+    return messages
+
+@telemetry.traced("analyze")
+def analyze_text_with_context(text_query: str, dataset: survey_data.SurveyDataset, route: router.Route):
     """텍스트 분석 및 응답 생성"""
     try:
-        # 실제 데이터 계산
-        unique_authors = set(item["author"] for item in data_list if item["author"])
-        total_questions = len(data_list)
-        author_count = len(unique_authors)
-        authors_list = sorted(list(unique_authors))
-
-        # 분석 요청인지 확인
-        is_analysis_request = any(keyword in text_query.lower() for keyword in [
-            '차트'
-        ])
-
-        # 프롬프트 설정
-        if is_analysis_request:
-            prompt = f"""
-            신한카드 신입사원들의 총 {total_questions}개의 질문을 정확히 5개의 카테고리로 분류해주세요.
-            반드시 아래 JSON 형식으로 작성해주세요.
-
-            데이터:
-            {json.dumps(data_list, ensure_ascii=False)}
-
-            다음과 같은 JSON 형식으로 정확하게 반환해주세요:
-            {{
-                "answer": "신입사원들의 질문을 5개 카테고리로 분석한 결과입니다.",
-                "categories": [
-                    {{
-                        "category": "카테고리1",
-                        "count": 20,
-                        "percentage": 20.0
-                    }},
-                    {{
-                        "category": "카테고리2",
-                        "count": 30,
-                        "percentage": 30.0
-                    }},
-                    {{
-                        "category": "카테고리3",
-                        "count": 25,
-                        "percentage": 25.0
-                    }},
-                    {{
-                        "category": "카테고리4",
-                        "count": 15,
-                        "percentage": 15.0
-                    }},
-                    {{
-                        "category": "카테고리5",
-                        "count": 10,
-                        "percentage": 10.0
-                    }}
-                ]
-            }}
-
-            규칙:
-            1. 반드시 위의 JSON 형식을 정확히 따라주세요
-            2. answer는 한 문장으로 작성해주세요
-            3. count는 각 카테고리에 속한 질문의 개수입니다
-            4. percentage는 전체 질문 중 해당 카테고리가 차지하는 비율입니다
-            5. 모든 카테고리의 count 합은 {total_questions}이어야 합니다
-            6. 모든 카테고리의 percentage 합은 100.0이어야 합니다
-            7. JSON 형식 외의 다른 텍스트는 포함하지 마세요
-            """
+        # 질문 유형에 따라 처리 (차트 요청은 분류 후 로컬 집계)
+        if route.intent == router.INTENT_CHART:
+            # 분류 라벨이 없거나 다시 분류를 요청한 경우에만 API 호출
+            # (카테고리 도출 후 질문 묶음을 병렬로 분류하고, 라벨은 세션 데이터셋에 저장)
+            if not dataset.labels or '다시' in text_query:
+                # 카테고리와 묶음별 분류 결과가 도착하는 대로 진행 상황 표시
+                progress_placeholder = st.empty()
+
+                def show_progress(categories, labels_by_row, total):
+                    with progress_placeholder.container():
+                        with st.chat_message("assistant", avatar=os.path.join(ASSETS_DIR, 'bot_character.png')):
+                            st.markdown(categorize.format_progress(categories, labels_by_row, total))
+
+                # 분류가 실패해도 진행 상황 표시는 지움
+                try:
+                    with telemetry.span("chart_labeling"):
+                        categories, labels = categorize.label_dataset(
+                            st.session_state.client,
+                            model=route.model,
+                            system_prompt=SYSTEM_PROMPT,
+                            dataset=dataset,
+                            token_budget=PROMPT_TOKEN_BUDGET,
+                            on_progress=show_progress
+                        )
+                finally:
+                    progress_placeholder.empty()
+                dataset = replace(dataset, categories=categories, labels=labels)
+                st.session_state.dataset = dataset
+
+            # 카테고리별 질문 목록, 작성자별 분포 등은 저장된 라벨로 바로 계산
+            breakdown_text = categorize.format_breakdown(dataset, text_query)
+            if breakdown_text:
+                with st.chat_message("assistant", avatar=os.path.join(ASSETS_DIR, 'bot_character.png')):
+                    st.markdown(breakdown_text)
+                save_message(breakdown_text, "assistant")
+                return breakdown_text
+
+            # 개수와 비율은 로컬에서 집계
+            result = categorize.summarize_dataset(dataset)
             
-            # 분석 요청은 스트리밍 없이 처리
-            response = st.session_state.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "당신은 CEO와 신입사원간의 커뮤니케이션을 돕는 챗봇입니다. 사용자의 질문이 신입사원들이 CEO에게 물어보는 것과 관련된 질문일 경우 업로드된 파일 바탕으로 답변하며, 그 외 일반적인 질문에 대해선 자연스럽게 알고 있는 사실을 답변합니다. 절대 없는 내용을 임의로 만들어서 답변하지 않습니다. "},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.0,
-                stream=False
+            # 분석 결과 텍스트 조합
+            response_text = f"### 분석 결과\n{result['answer']}\n\n#### 카테고리별 분포\n"
+            for category in result["categories"]:
+                response_text += f"- **{category['category']}**: {category['count']}개 ({category['percentage']}%)\n"
+
+            # 파이 차트 생성
+            df = pd.DataFrame(result["categories"])
+            fig = px.pie(
+                df, 
+                values='percentage', 
+                names='category',
+                title='질문 카테고리 분포',
+                color_discrete_sequence=px.colors.qualitative.Set3
             )
-            
-            try:
-                result = json.loads(response.choices[0].message.content)
-                
-                # 분석 결과 텍스트 조합
-                response_text = f"### 분석 결과\n{result['answer']}\n\n#### 카테고리별 분포\n"
-                for category in result["categories"]:
-                    response_text += f"- **{category['category']}**: {category['count']}개 ({category['percentage']}%)\n"
-
-                # 파이 차트 생성
-                if "categories" in result:
-                    df = pd.DataFrame(result["categories"])
-                    fig = px.pie(
-                        df, 
-                        values='percentage', 
-                        names='category',
-                        title='질문 카테고리 분포',
-                        color_discrete_sequence=px.colors.qualitative.Set3
-                    )
-
-                    # 한글 폰트를 Plotly 차트에 적용
-                    fig.update_layout(
-                        title=dict(
-                            text='질문 카테고리 분포',
-                            font=dict(size=20, family="Nanum Gothic")
-                        ),
-                        font=dict(
-                            family="Nanum Gothic",
-                            size=14
-                        )
-                    )
 
-                    fig.update_traces(
-                        textfont=dict(
-                            family="Nanum Gothic",
-                            size=14
-                        )
-                    )
-                    
-                    # 텍스트와 차트를 함께 표시
-                    with st.chat_message("assistant", avatar=os.path.join(ASSETS_DIR, 'bot_character.png')):
-                        st.markdown(response_text)
-                        st.plotly_chart(fig)
-                        
-                    # 히스토리용 차트를 실시간 차트와 동일한 설정으로 생성
-                    history_fig = px.pie(
-                        df, 
-                        values='percentage', 
-                        names='category',
-                        title='질문 카테고리 분포',
-                        color_discrete_sequence=px.colors.qualitative.Set3  # 실시간 차트와 동일한 색상
-                    )
-
-                    # 실시간 차트와 동일한 폰트 설정 적용
-                    history_fig.update_layout(
-                        title=dict(
-                            text='질문 카테고리 분포',
-                            font=dict(size=20, 
-                            family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial")
-                        ),
-                        font=dict(
-                            family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial",
-                            size=14
-                        )
-                    )
-
-                    history_fig.update_traces(
-                        textfont=dict(
-                            family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial",
-                            size=14
-                        )
-                    )
-
-                    # 히스토리용 차트를 이미지로 변환
-                    chart_bytes = history_fig.to_image(
-                        format="png",
-                        width=800,
-                        height=600,
-                        scale=2,
-                        engine="kaleido"
-                    )
-                    chart_base64 = base64.b64encode(chart_bytes).decode("utf-8")
-                    
-                else:
-                    chart_base64 = None
+            # 한글 폰트를 Plotly 차트에 적용
+            fig.update_layout(
+                title=dict(
+                    text='질문 카테고리 분포',
+                    font=dict(size=20, family="Nanum Gothic")
+                ),
+                font=dict(
+                    family="Nanum Gothic",
+                    size=14
+                )
+            )
 
-                # 답변 표시 및 히스토리에 저장
-                # st.markdown(response_text, unsafe_allow_html=True)
-                save_message(response_text, "assistant", image_base64=chart_base64)
-                
-                return result['answer']
+            fig.update_traces(
+                textfont=dict(
+                    family="Nanum Gothic",
+                    size=14
+                )
+            )
+            
+            # 텍스트와 차트를 함께 표시
+            with st.chat_message("assistant", avatar=os.path.join(ASSETS_DIR, 'bot_character.png')):
+                st.markdown(response_text)
+                st.plotly_chart(fig)
                 
-            except json.JSONDecodeError as e:
-                st.error(f"JSON 파싱 중 오류가 발생했습니다: {str(e)}")
-                return None
-
-        else:
-            # 일반 질문일 경우
-            # 응답 템플릿 변수 정의
-            TEMPLATE_1 = """신입사원들의 질문을 분석한 결과, 가장 많이 나온 주제는 다음과 같습니다:
-
-            ## 1. 신입사원의 자세 및 마음가짐 
-            여러 질문에서 신입사원이 가져야 할 자세, 마음가짐, 태도에 대한 궁금증이 많이 나타났습니다. 예를 들어, "신입사원에게 바라는 자세나 가장 강조하고 싶은 부분", "신입사원으로서 가져야 할 가장 중요한 마음가짐" 등의 질문이 이에 해당합니다.
-
-            ## 2. CEO의 경험 및 경영 철학 
-            신입사원들은 CEO의 경력, 직무 경험, 그리고 CEO가 되기까지의 과정에 대한 질문을 많이 했습니다. "CEO가 되신 비결", "가장 기억에 남는 순간", "어려웠던 일" 등의 질문이 이 주제에 포함됩니다.
-
-            ## 3. 업무 및 직무 관련 조언 
-            신입사원들은 업무 수행, 직무 경험, 그리고 회사에서의 성장에 대한 조언을 요청하는 질문이 많았습니다. "신입사원으로서 회사에 빠르게 기여할 수 있는 방법", "업무 외에 가장 열정을 담아 하시는 것이 무엇인지", "신한카드에서 업무를 효과적으로 수행하기 위한 학습 분야" 등의 질문이 이 주제에 해당합니다.
+            # 히스토리용 차트를 실시간 차트와 동일한 설정으로 생성
+            history_fig = px.pie(
+                df, 
+                values='percentage', 
+                names='category',
+                title='질문 카테고리 분포',
+                color_discrete_sequence=px.colors.qualitative.Set3  # 실시간 차트와 동일한 색상
+            )
 
-            이 세 가지 주제는 신입사원들이 CEO와의 소통을 통해 얻고자 하는 주요 관심사로 나타났습니다."""
+            # 실시간 차트와 동일한 폰트 설정 적용
+            history_fig.update_layout(
+                title=dict(
+                    text='질문 카테고리 분포',
+                    font=dict(size=20, 
+                    family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial")
+                ),
+                font=dict(
+                    family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial",
+                    size=14
+                )
+            )
 
-            TEMPLATE_2 = """아래는 신입사원들의 질문을 주제별로 정리한 결과입니다. 유사한 질문은 중복 제거하였으며, 질문자의 이름은 가렸습니다.
+            history_fig.update_traces(
+                textfont=dict(
+                    family="Nanum Gothic, Malgun Gothic, Arial Unicode MS, Arial",
+                    size=14
+                )
+            )
 
-            ## 1. 신입사원으로서의 자세 및 마음가짐
-            1. 신입사원에게 바라는 자세나 가장 강조하고 싶은 부분이 무엇인지 궁금합니다.
-            2. 신입사원으로서 회사에 빠르게 기여할 수 있는 방법이 궁금합니다.
+            # 히스토리용 차트를 이미지로 변환
+            with telemetry.span("chart_image"):
+                chart_bytes = history_fig.to_image(
+                    format="png",
+                    width=800,
+                    height=600,
+                    scale=2,
+                    engine="kaleido"
+                )
+            chart_base64 = base64.b64encode(chart_bytes).decode("utf-8")
 
-            ## 2. CEO의 경험 및 조언
-            
-            1. CEO가 되신 비결이 궁금합니다.
-            2. 회사생활 중 위기 혹은 어려움을 겪은 사례, 극복 방법 등을 여쭙고 싶습니다.
 
-            ## 3. 직무 및 커리어 관련
+            # 답변 표시 및 히스토리에 저장
+            # st.markdown(response_text, unsafe_allow_html=True)
+            save_message(response_text, "assistant", image_base64=chart_base64)
             
-            1. 신한카드에서 어떤 팀에서 일을 하셨는지 궁금합니다!
-            2. 카드업의 미래에 대해서 어떻게 생각하시는지 궁금하고, 이에 대비해서 신입사원으로서 어떤 준비를 하면 좋을지 여쭙고 싶습니다!
-
-            이와 같은 질문들은 신입사원들이 CEO에게 궁금해하는 다양한 측면을 반영하고 있습니다."""
-
-            # analyze_text_with_context 함수 내에서 사용할 프롬프트
-            prompt = f"""
-            당신은 신한카드 CEO와 신입사원들 간의 소통을 돕는 AI 어시스턴트입니다.
-
-            질문이 다음 두 가지 특정 유형에 해당할 때만 정해진 형식으로 답변하고,
-            그 외의 일반적인 질문에는 자연스러운 대화체로 답변해주세요:
-
-            유형 1: "신입사원의 질문을 기반으로 가장 많이 나온 주제 3개를 출력해줘"와 유사한 질문
-            - 예시: "가장 많이 나온 주제가 뭐야?", "신입사원들이 주로 어떤 질문을 했어?", "많이 나온 주제 알려줘" 등
-            - 이 경우 반드시 다음 형식으로 답변:
-            {TEMPLATE_1}
+            return result['answer']
 
-            유형 2: "방금 출력해준 3가지 주제별로 가장 많이 나온 질문 3개씩 출력해줘"와 유사한 질문
-            - 예시: "각 주제의 대표적인 질문들 알려줘", "주제별 질문 리스트 보여줘", "자주 나온 질문들 정리해줘" 등
-            - 이 경우 반드시 다음 형식으로 답변:
-            {TEMPLATE_2}
-
-            기초 데이터:
-            - 포함된 필드: {', '.join(data_list[0].keys())}
-
-            데이터:
-            {json.dumps(data_list, ensure_ascii=False)}
-
-            질문: {text_query}
-
-            규칙:
-            1. 위의 두 유형과 유사한 질문이면 반드시 정해진 형식으로만 답변하세요
-            2. 다른 질문인 경우에만 자유롭게 답변하세요
-            3. 정해진 형식으로 답변할 때는 단어 하나도 다르게 쓰지 마세요
-            4. 데이터에 없는 내용은 절대 추측하지 마세요
-            5. 질문의 의도를 파악하여 가장 적절한 템플릿을 선택하세요
-            6. 답변은 항상 완전한 형태로 제공하세요 (중간에 '...' 등으로 생략하지 않음)
-            """
-            
-            # 일반 질문은 스트리밍으로 처리
-            response = st.session_state.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "당신은 데이터 분석 전문가입니다."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.0,
-                stream=True
-            )
+        else:
+            # 일반 질문일 경우
+            # 주요 주제 / 주제별 대표 질문은 업로드 시 미리 계산한 결과로 바로 답변
+            cached_response = None
+            topic_intent = topics.detect_intent(text_query) if route.intent == router.INTENT_TOPICS else None
+            if topic_intent:
+                topic_result = topics.get_topics(dataset.key)
+                if topic_result:
+                    cached_response = topics.format_answer(topic_result, topic_intent)
+
+            # 통계 질문은 데이터셋에서 바로 계산 (문장으로 다듬어 달라는 경우에만 모델 사용)
+            local_answer = survey_stats.answer(text_query, dataset) if route.intent == router.INTENT_STATISTICS else None
+            if cached_response is None and local_answer is not None and not survey_stats.wants_phrasing(text_query):
+                cached_response = local_answer
+
+            # 모델 없이 계산한 답변은 사용량 장부에서 모델 캐시 적중과 구분
+            answered_locally = cached_response is not None
+
+            # 같은 데이터셋에 같은(또는 표현만 다른) 질문이면 저장된 답변을 재사용
+            # (이전 대화를 참고하는 질문은 대화마다 답이 다르므로 제외)
+            use_cache = not conversation.is_follow_up(text_query)
+            cache_key = response_cache.make_key(dataset.key, text_query, route.model, PROMPT_VERSION)
+            if cached_response is None and use_cache:
+                cached_response = response_cache.get(cache_key)
+            if cached_response is None and use_cache:
+                cached_response = response_cache.find_similar(dataset.key, text_query, route.model, PROMPT_VERSION)
+            if cached_response is not None:
+                # API를 호출하지 않은 답변도 캐시 적중률 집계를 위해 기록
+                usage_ledger.record(usage_ledger.LOCAL_MODEL if answered_locally else route.model, cache_hit=True)
+                deltas = response_cache.replay_chunks(cached_response)
+            else:
+                if local_answer is not None:
+                    messages = survey_stats.build_phrasing_messages(text_query, local_answer)
+                else:
+                    history = conversation.build_history(st.session_state.messages, text_query, HISTORY_TOKEN_BUDGET)
+                    messages = build_general_messages(text_query, dataset, history)
+
+                # 일반 질문은 스트리밍으로 처리
+                request_started = time.perf_counter()
+                response = st.session_state.client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=0.0,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                deltas = telemetry.timed_stream(prompting.stream_deltas(response, route.intent), "llm", request_started)
             
-            # 스트리밍 응답 처리
-            full_response = ""
+            # 스트리밍 응답 처리 (조각을 모아 일정 간격으로만 화면 갱신)
             # 아바타와 함께 메시지 컨테이너 생성
             
             with st.chat_message("assistant", avatar=os.path.join(ASSETS_DIR, 'bot_character.png')):
                 message_placeholder = st.empty()
                 try:
-                    for chunk in response:
-                        if chunk and hasattr(chunk.choices[0].delta, 'content') and chunk.choices[0].delta.content:
-                            full_response += chunk.choices[0].delta.content
-                            message_placeholder.markdown(full_response + "▌")
-                            time.sleep(0.01)
-                    message_placeholder.markdown(full_response)
+                    full_response = rendering.render_stream(message_placeholder, deltas)
+                    if cached_response is None and use_cache:
+                        response_cache.put(cache_key, full_response, dataset.key, text_query, route.model, PROMPT_VERSION)
                     return full_response
                 
                 except Exception as e:
@@ -425,6 +431,7 @@ def save_message(message, role, image_base64=None):
         "image": image_base64  # 이미지 데이터 추가
     })
 
+@telemetry.traced("render_message")
 def send_message(message, role, image_base64=None, is_history=False):
     """메시지 표시"""
     try:
@@ -436,14 +443,8 @@ def send_message(message, role, image_base64=None, is_history=False):
         if os.path.exists(avatar_path):
             with st.chat_message(role, avatar=avatar_path):
                 if role == "assistant" and not is_history:  # 히스토리가 아닐 때만 스트리밍 효과 적용
-                    # 스트리밍 효과를 위한 점진적 표시
-                    placeholder = st.empty()
-                    displayed_message = ""
-                    for char in message:
-                        displayed_message += char
-                        placeholder.markdown(displayed_message + "▌")
-                        time.sleep(0.01)
-                    placeholder.markdown(displayed_message)
+                    # 스트리밍 효과를 위한 점진적 표시 (단어 단위, 총 표시 시간 고정)
+                    rendering.reveal(st.empty(), message, REVEAL_SECONDS)
                 else:
                     st.markdown(message, unsafe_allow_html=True)
                 
@@ -453,13 +454,7 @@ def send_message(message, role, image_base64=None, is_history=False):
         else:
             with st.chat_message(role):
                 if role == "assistant" and not is_history:  # 히스토리가 아닐 때만 스트리밍 효과 적용
-                    placeholder = st.empty()
-                    displayed_message = ""
-                    for char in message:
-                        displayed_message += char
-                        placeholder.markdown(displayed_message + "▌")
-                        time.sleep(0.01)
-                    placeholder.markdown(displayed_message)
+                    rendering.reveal(st.empty(), message, REVEAL_SECONDS)
                 else:
                     st.markdown(message, unsafe_allow_html=True)
                 
@@ -477,6 +472,7 @@ def send_message(message, role, image_base64=None, is_history=False):
 
 def main():
     initialize_session_state()
+    telemetry.setup()
 
     # 사이드바
     with st.sidebar:
@@ -491,12 +487,20 @@ def main():
     uploaded_file = st.file_uploader("분석할 파일을 업로드하세요 (CSV 또는 XLSX)", type=["csv", "xlsx"])
     
     if uploaded_file:
-        file_analysis_result = analyze_uploaded_file(uploaded_file)
-        if file_analysis_result:
-            text_data, data_list, df = file_analysis_result
+        dataset = analyze_uploaded_file(uploaded_file)
+        if dataset:
             st.success("파일이 성공적으로 업로드되었습니다.")
-            st.session_state.file_data = text_data
-            st.session_state.data_list = data_list
+            # 같은 데이터셋이면 분류 라벨이 저장된 세션 데이터셋 유지
+            if st.session_state.dataset is None or st.session_state.dataset.key != dataset.key:
+                st.session_state.dataset = dataset
+            # 업로드 시점에 검색 색인을 미리 생성하고 주요 주제 계산을 백그라운드로 시작
+            retrieval.build_index(dataset.key, dataset)
+            with usage_ledger.context(
+                session_id=usage_ledger.session_id(), dataset_key=dataset.key, intent=router.INTENT_TOPICS
+            ):
+                topics.start_topic_job(
+                    st.session_state.client, LLM_MODEL, SYSTEM_PROMPT, dataset, PROMPT_TOKEN_BUDGET
+                )
 
     # 대화 이력 표시
     for message in st.session_state.messages:
@@ -508,23 +512,29 @@ def main():
         )
 
     # 채팅 인터페이스
-    if st.session_state.file_data:
+    if st.session_state.dataset:
         query = st.chat_input("파일에 대해 궁금한 점을 물어보세요")
         if query:
             # 사용자 메시지 표시
             send_message(query, "human")
             save_message(query, "human")
 
-            # AI 응답 생성 및 표시
-            with st.spinner("분석 중..."):
+            # 질문 유형과 사용할 모델 결정
+            route = router.route_query(query, st.session_state.dataset, LLM_MODELS)
+
+            # AI 응답 생성 및 표시 (단계별 처리 시간과 세션/데이터셋/질문 유형별 API 사용량 기록)
+            usage_context = usage_ledger.context(
+                session_id=usage_ledger.session_id(), dataset_key=st.session_state.dataset.key, intent=route.intent
+            )
+            with st.spinner("분석 중..."), telemetry.trace("query"), usage_context:
                 response = analyze_text_with_context(
                     query,
-                    st.session_state.file_data,
-                    st.session_state.data_list
+                    st.session_state.dataset,
+                    route
                 )
                 
                 if response:
-                    if any(keyword in query.lower() for keyword in ['차트']):
+                    if route.intent == router.INTENT_CHART:
                         # 분석 요청의 경우 analyze_text_with_context 함수 내에서 처리됨
                         pass
                     else:
@@ -532,5 +542,10 @@ def main():
                         #send_message(response, "assistant")
                         save_message(response, "assistant")
 
+    # 단계별 처리 시간 (secrets의 debug_panel 설정 시에만 표시)
+    with st.sidebar:
+        telemetry.render_debug_panel()
+
 if __name__ == "__main__":
-    main()
+    with telemetry.span("rerun"):
+        main()
@@ -0,0 +1,72 @@
+import re
+
+import prompting
+
+# 이전 대화에 사용할 토큰 예산 (secrets의 history_token_budget으로 변경 가능)
+DEFAULT_HISTORY_TOKEN_BUDGET = 2000
+# 원문으로 보낼 최근 메시지 수와 메시지당 최대 길이 (긴 답변은 앞부분만)
+MAX_RECENT_MESSAGES = 6
+MAX_MESSAGE_CHARS = 1500
+# 예산을 넘는 오래된 대화는 메시지당 한 줄로 요약
+SUMMARY_LINE_CHARS = 80
+
+# 이전 대화를 가리키는 표현 (대화마다 답이 달라지므로 저장된 답변을 재사용하지 않음)
+FOLLOW_UP_PATTERN = re.compile(r"방금|아까|위에서|위의|앞에서|앞서|이전|그\s*중|그거|그것|거기|더\s*자세히|다시\s*설명")
+
+ROLE_NAMES = {"human": "user", "assistant": "assistant"}
+
+
+def is_follow_up(query: str) -> bool:
+    """이전 대화를 참고해야 하는 질문인지 확인"""
+    return bool(FOLLOW_UP_PATTERN.search(query))
+
+
+def _clip(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def _summary_line(message: dict) -> str:
+    """메시지 첫 줄을 마크다운 기호 없이 한 줄로 요약"""
+    first_line = next((line for line in message["message"].splitlines() if line.strip()), "")
+    first_line = re.sub(r"\s+", " ", re.sub(r"[#*>|`]+", " ", first_line))
+    speaker = "사용자" if message["role"] == "human" else "챗봇"
+    return f"- {speaker}: {_clip(first_line, SUMMARY_LINE_CHARS)}"
+
+
+def build_history(session_messages: list, current_query: str, token_budget: int = DEFAULT_HISTORY_TOKEN_BUDGET) -> list:
+    """세션 대화 기록을 토큰 예산 안의 메시지 목록으로 변환 (최근 대화는 원문, 오래된 대화는 로컬에서 한 줄 요약)"""
+    turns = [message for message in session_messages if message.get("role") in ROLE_NAMES and message.get("message")]
+    # 방금 입력한 질문은 마지막 user 메시지로 따로 보냄
+    if turns and turns[-1]["role"] == "human" and turns[-1]["message"] == current_query:
+        turns = turns[:-1]
+
+    recent = []
+    older = turns
+    tokens = 0
+    for idx in range(len(turns) - 1, -1, -1):
+        if len(recent) >= MAX_RECENT_MESSAGES:
+            break
+        content = _clip(turns[idx]["message"], MAX_MESSAGE_CHARS)
+        # 메시지 구분 토큰 4개 포함
+        message_tokens = prompting.count_tokens(content) + 4
+        if tokens + message_tokens > token_budget:
+            break
+        recent.insert(0, {"role": ROLE_NAMES[turns[idx]["role"]], "content": content})
+        tokens += message_tokens
+        older = turns[:idx]
+
+    # 남은 예산으로 오래된 대화 요약 (최근 것부터)
+    summary_lines = []
+    for message in reversed(older):
+        line = _summary_line(message)
+        line_tokens = prompting.count_tokens(line) + 1
+        if tokens + line_tokens > token_budget:
+            break
+        summary_lines.insert(0, line)
+        tokens += line_tokens
+
+    history = []
+    if summary_lines:
+        history.append({"role": "system", "content": "이전 대화 요약:\n" + "\n".join(summary_lines)})
+    return history + recent
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import pandas as pd
+
+# 파싱 결과를 Parquet 파일로 보관하는 로컬 저장소 (파일 해시 기준)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.environ.get("DATASET_STORE_DIR", os.path.join(SCRIPT_DIR, ".dataset_store"))
+STORE_MAX_FILES = 64
+
+
+def _store_path(key: str) -> str:
+    return os.path.join(STORE_DIR, f"{key}.parquet")
+
+
+def load_frame(key: str):
+    """저장소에서 DataFrame 읽기 (없으면 None)"""
+    path = _store_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path, memory_map=True)
+        # 최근 사용 시각 갱신 (정리 순서 기준)
+        os.utime(path)
+        return df
+    except Exception as e:
+        print(f"Dataset store read error: {str(e)}")
+        return None
+
+
+def save_frame(key: str, df) -> bool:
+    """DataFrame을 저장소에 기록 (Parquet 변환이 불가능한 데이터는 건너뜀)"""
+    path = _store_path(key)
+    tmp_path = None
+    try:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        # 같은 프로세스의 여러 세션이 같은 데이터셋을 동시에 기록해도 겹치지 않도록 기록마다 임시 파일 생성
+        fd, tmp_path = tempfile.mkstemp(dir=STORE_DIR, prefix=f"{key}.", suffix=".tmp")
+        os.close(fd)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Dataset store write error: {str(e)}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    _prune()
+    return True
+
+
+def _prune():
+    """오래 사용하지 않은 파일부터 삭제하여 최대 개수 유지"""
+    try:
+        paths = [
+            os.path.join(STORE_DIR, name)
+            for name in os.listdir(STORE_DIR)
+            if name.endswith(".parquet")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[STORE_MAX_FILES:]:
+            os.remove(path)
+    except OSError as e:
+        print(f"Dataset store prune error: {str(e)}")
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import streamlit as st
+from openai import AsyncOpenAI, OpenAI
+
+import usage_ledger
+
+# 프로세스 전체에서 공유하는 API 클라이언트 설정 (secrets로 변경 가능)
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+
+# llm_base_url(또는 환경변수 LLM_BASE_URL)로 로컬 모의 서버 등 OpenAI 호환 서버를 지정하면 API 키 없이 실행 가능
+LOCAL_API_KEY = "local"
+
+
+class ConcurrencyLimitError(Exception):
+    """동시 요청 한도를 기다리다 시간이 초과된 경우"""
+
+
+def _is_retryable(error: Exception) -> bool:
+    """재시도할 오류인지 확인 (429, 5xx, 연결/타임아웃 오류)"""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _backoff_seconds(attempt: int, error: Exception) -> float:
+    """지수 백오프 + 지터 (Retry-After 헤더가 있으면 우선 사용)"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+    return random.uniform(0, delay)
+
+
+class _ReleasingStream:
+    """스트리밍 응답을 끝까지 읽거나 닫을 때 동시 요청 슬롯 반환 (사용량은 사용량 장부에 기록)"""
+
+    def __init__(self, stream, release, model: str, started_at: float):
+        self._stream = stream
+        self._release = release
+        self._model = model
+        self._started_at = started_at
+        self._usage = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                if getattr(chunk, "usage", None) is not None:
+                    self._usage = chunk.usage
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+            release()
+            usage_ledger.record_usage(self._model, self._usage, time.perf_counter() - self._started_at)
+
+    def __del__(self):
+        self.close()
+
+
+class _Completions:
+    def __init__(self, client: OpenAI, semaphore: threading.BoundedSemaphore, timeout: float, max_retries: int):
+        self._client = client
+        self._semaphore = semaphore
+        self._timeout = timeout
+        self._max_retries = max_retries
+
+    def create(self, **kwargs):
+        """동시 요청 한도 안에서 요청하고, 일시적인 오류는 백오프 후 재시도"""
+        if not self._semaphore.acquire(timeout=self._timeout):
+            raise ConcurrencyLimitError("동시 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요.")
+        started_at = time.perf_counter()
+        try:
+            for attempt in range(self._max_retries + 1):
+                try:
+                    response = self._client.chat.completions.create(timeout=self._timeout, **kwargs)
+                    break
+                except Exception as e:
+                    if attempt == self._max_retries or not _is_retryable(e):
+                        raise
+                    time.sleep(_backoff_seconds(attempt, e))
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        if kwargs.get("stream"):
+            return _ReleasingStream(response, self._semaphore.release, kwargs.get("model", ""), started_at)
+        self._semaphore.release()
+        usage_ledger.record_usage(kwargs.get("model", ""), response.usage, time.perf_counter() - started_at)
+        return response
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        """비동기 요청 (동기 클라이언트와 같은 동시 요청 한도 공유)"""
+        loop = asyncio.get_running_loop()
+        acquired = await loop.run_in_executor(None, lambda: self._semaphore.acquire(timeout=self._timeout))
+        if not acquired:
+            raise ConcurrencyLimitError("동시 요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요.")
+        started_at = time.perf_counter()
+        try:
+            for attempt in range(self._max_retries + 1):
+                try:
+                    response = await self._client.chat.completions.create(timeout=self._timeout, **kwargs)
+                    break
+                except Exception as e:
+                    if attempt == self._max_retries or not _is_retryable(e):
+                        raise
+                    await asyncio.sleep(_backoff_seconds(attempt, e))
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        if kwargs.get("stream"):
+            return _AsyncReleasingStream(response, self._semaphore.release, kwargs.get("model", ""), started_at)
+        self._semaphore.release()
+        usage_ledger.record_usage(kwargs.get("model", ""), response.usage, time.perf_counter() - started_at)
+        return response
+
+
+class _AsyncReleasingStream:
+    def __init__(self, stream, release, model: str, started_at: float):
+        self._stream = stream
+        self._release = release
+        self._model = model
+        self._started_at = started_at
+        self._usage = None
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                if getattr(chunk, "usage", None) is not None:
+                    self._usage = chunk.usage
+                yield chunk
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+            usage_ledger.record_usage(self._model, self._usage, time.perf_counter() - self._started_at)
+
+    def __del__(self):
+        self._release_slot()
+
+
+class PooledClient:
+    """OpenAI 클라이언트와 같은 방식(client.chat.completions.create)으로 사용하는 공유 클라이언트"""
+
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+def secret(name: str, default=None):
+    """secrets 설정값 (secrets.toml이 없으면 기본값)"""
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+
+def _settings():
+    return (
+        int(secret("llm_max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+        float(secret("llm_timeout_seconds", DEFAULT_TIMEOUT_SECONDS)),
+        int(secret("llm_max_retries", DEFAULT_MAX_RETRIES)),
+    )
+
+
+def base_url():
+    """API 서버 주소 (환경변수 LLM_BASE_URL 우선, 지정하지 않으면 None으로 기본 OpenAI 서버 사용)"""
+    return os.environ.get("LLM_BASE_URL") or secret("llm_base_url") or None
+
+
+def api_key() -> str:
+    """API 키 (다른 서버를 지정한 경우 키가 없어도 됨)"""
+    if base_url():
+        return secret("llm_api_key", LOCAL_API_KEY)
+    return st.secrets["llm_api_key"]
+
+
+@st.cache_resource
+def _semaphore(max_concurrency: int) -> threading.BoundedSemaphore:
+    """동기/비동기 클라이언트가 공유하는 전역 동시 요청 한도"""
+    return threading.BoundedSemaphore(max_concurrency)
+
+
+@st.cache_resource
+def get_client(api_key: str) -> PooledClient:
+    """프로세스 전체에서 하나만 생성되는 클라이언트 (연결 풀 공유)"""
+    max_concurrency, timeout, max_retries = _settings()
+    # 재시도는 직접 처리하므로 SDK 자체 재시도는 끔
+    client = OpenAI(api_key=api_key, base_url=base_url(), timeout=timeout, max_retries=0)
+    return PooledClient(_Completions(client, _semaphore(max_concurrency), timeout, max_retries))
+
+
+@st.cache_resource
+def get_async_client(api_key: str) -> PooledClient:
+    """비동기 버전 공유 클라이언트"""
+    max_concurrency, timeout, max_retries = _settings()
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url(), timeout=timeout, max_retries=0)
+    return PooledClient(_AsyncCompletions(client, _semaphore(max_concurrency), timeout, max_retries))
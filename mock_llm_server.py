@@ -0,0 +1,236 @@
+# 오프라인 성능 측정용 OpenAI 호환 모의 서버 (chat completions, 스트리밍/일반 응답)
+#
+# 실행: python mock_llm_server.py --port 8000 --ttft 0.3 --tokens-per-second 50 --error-rate 0.05
+# 앱 연결: .streamlit/secrets.toml에 llm_base_url = "http://127.0.0.1:8000/v1" 지정 (API 키 불필요)
+# 모의 응답과 호출 기록이 실제 응답 캐시/사용량 장부에 섞이지 않도록 RESPONSE_CACHE_PATH, USAGE_LEDGER_PATH를 별도 경로로 지정해서 실행
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 차트 경로에서 사용하는 고정 응답
+MOCK_CATEGORIES = ["회사 비전과 전략", "조직 문화", "커리어 성장", "업무 역량", "CEO 개인"]
+MOCK_ANSWER = (
+    "신입사원들의 질문을 살펴보면 회사의 비전과 전략, 조직 문화, 커리어 성장에 대한 관심이 높게 나타납니다. "
+    "특히 입사 초기에 어떤 역량을 키워야 하는지, 선배들과 어떻게 소통해야 하는지에 대한 질문이 많았습니다. "
+)
+# 프롬프트 캐시 흉내 (같은 system 메시지가 다시 오면 128토큰 단위로 캐시된 것으로 계산)
+PROMPT_CACHE_BLOCK_TOKENS = 128
+
+
+@dataclass
+class MockConfig:
+    ttft_seconds: float = 0.3
+    tokens_per_second: float = 50.0
+    error_rate: float = 0.0
+    response_tokens: int = 200
+    seed: int = 0
+
+
+def _estimate_tokens(text: str) -> int:
+    """토크나이저 없이 계산하는 대략적인 토큰 수"""
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _json_content(prompt: str) -> str:
+    """프롬프트 종류(주제, 분류, 카테고리 도출)에 맞는 고정 JSON 응답"""
+    row_ids = [int(number) for number in re.findall(r"^(\d+)\t", prompt, re.M)]
+    if '"question_ids"' in prompt:
+        result = {"topics": [
+            {"title": category, "summary": f"{category}에 대한 질문입니다.", "question_ids": row_ids[idx::3][:3]}
+            for idx, category in enumerate(MOCK_CATEGORIES[:3])
+        ]}
+    elif '"labels"' in prompt:
+        category_count = len(re.findall(r"^\s*\d+\. ", prompt, re.M)) or len(MOCK_CATEGORIES)
+        result = {"labels": {str(row_id): row_id % category_count + 1 for row_id in row_ids}}
+    elif '"categories"' in prompt:
+        result = {"categories": MOCK_CATEGORIES}
+    else:
+        result = {"result": "ok"}
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _text_pieces(content: str, size: int) -> list:
+    return [content[start:start + size] for start in range(0, len(content), size)]
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: MockConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    def error_status(self):
+        """설정한 비율로 429 또는 500 상태 코드 반환 (정상 응답이면 None)"""
+        with self._lock:
+            if self._random.random() >= self.config.error_rate:
+                return None
+            return self._random.choice((429, 500))
+
+    def cached_tokens(self, messages: list) -> int:
+        """앞부분 system 메시지가 이전 요청과 같으면 캐시된 토큰 수 반환"""
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = messages[0].get("content", "")
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            seen = digest in self._seen_prefixes
+            self._seen_prefixes.add(digest)
+        if not seen:
+            return 0
+        return _estimate_tokens(prefix) // PROMPT_CACHE_BLOCK_TOKENS * PROMPT_CACHE_BLOCK_TOKENS
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+
+        # 설정한 비율만큼 429/500 오류 응답 (재시도 동작 확인용)
+        status = self.server.error_status()
+        if status == 429:
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}}, {"Retry-After": "0"})
+            return
+        if status == 500:
+            self._send_json(500, {"error": {"message": "server error", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        prompt = messages[-1].get("content", "") if messages else ""
+        is_json = (request.get("response_format") or {}).get("type") == "json_object"
+        if is_json:
+            pieces = _text_pieces(_json_content(prompt), 4)
+        else:
+            content = (MOCK_ANSWER * (config.response_tokens // 40 + 1))
+            pieces = _text_pieces(content, 2)[:config.response_tokens]
+
+        prompt_tokens = sum(_estimate_tokens(message.get("content", "")) for message in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces),
+            "prompt_tokens_details": {"cached_tokens": self.server.cached_tokens(messages)}
+        }
+        model = request.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        time.sleep(config.ttft_seconds)
+        if not request.get("stream"):
+            time.sleep(delay * len(pieces))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(choices, usage=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            send_event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for idx, piece in enumerate(pieces):
+                if idx:
+                    time.sleep(delay)
+                send_event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            send_event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send_event([], usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_in_thread(config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """백그라운드 스레드에서 서버 실행 (서버와 base_url 반환, port=0이면 빈 포트 사용)"""
+    server = MockLLMServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 모의 chat completions 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ttft", type=float, default=MockConfig.ttft_seconds, help="첫 토큰까지 걸리는 시간(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate, help="429/500 오류 응답 비율 (0~1)")
+    parser.add_argument("--response-tokens", type=int, default=MockConfig.response_tokens)
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        ttft_seconds=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        response_tokens=args.response_tokens,
+        seed=args.seed
+    )
+    server = MockLLMServer((args.host, args.port), config)
+    print(f"Mock LLM server: http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import streamlit as st
+
+# 프롬프트 데이터 영역의 기본 토큰 예산 (secrets의 prompt_token_budget으로 변경 가능)
+DEFAULT_TOKEN_BUDGET = 60000
+# 질문 길이에 따라 데이터 영역(프롬프트 캐시 앞부분)이 바뀌지 않도록 질문 몫으로 남겨 둘 토큰 수 (더 긴 질문은 실제 길이)
+QUERY_TOKEN_RESERVE = 500
+# 문구를 이어 붙일 때 생기는 토큰 수 차이와 생략 안내 문구를 위한 여유분
+TOKEN_SAFETY_MARGIN = 100
+# 프롬프트에 이름을 넣을 최대 작성자 수 (질문 수 상위, 나머지는 인원수만)
+MAX_PROMPT_AUTHORS = 20
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """gpt-4o 계열 토크나이저 로드 (사용할 수 없으면 None)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"Tokenizer loading error: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """텍스트의 토큰 수 계산 (토크나이저가 없으면 UTF-8 바이트 기준 근사치)"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+@dataclass(frozen=True)
+class EncodedData:
+    """프롬프트에 포함할 데이터 영역"""
+    text: str
+    fields: tuple
+    row_count: int
+    total_rows: int
+    tokens: int
+    is_retrieved: bool = False
+
+    @property
+    def is_truncated(self) -> bool:
+        return self.row_count < self.total_rows
+
+
+def _clean_cell(value: str) -> str:
+    """줄바꿈/탭을 공백으로 바꿔 한 줄로 정리"""
+    return re.sub(r"\s+", " ", value).strip()
+
+
+def row_fields(include_authors: bool = True) -> tuple:
+    """데이터 영역의 컬럼 이름"""
+    return ("번호", "작성자", "질문") if include_authors else ("번호", "질문")
+
+
+def encode_rows(dataset, row_ids, include_authors: bool = True, token_budget: int = DEFAULT_TOKEN_BUDGET, is_retrieved: bool = False):
+    """지정한 행을 번호가 붙은 TSV 행으로 인코딩 (토큰 예산을 넘는 행은 제외)"""
+    fields = row_fields(include_authors)
+    if include_authors:
+        rows = (
+            f"{idx + 1}\t{_clean_cell(dataset.authors[idx])}\t{_clean_cell(dataset.questions[idx])}"
+            for idx in row_ids
+        )
+    else:
+        rows = (
+            f"{idx + 1}\t{_clean_cell(dataset.questions[idx])}"
+            for idx in row_ids
+        )
+
+    header = "\t".join(fields)
+    lines = [header]
+    tokens = count_tokens(header)
+    for line in rows:
+        # 줄바꿈 토큰 1개 포함
+        line_tokens = count_tokens(line) + 1
+        if tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+
+    row_count = len(lines) - 1
+    return EncodedData(
+        text="\n".join(lines),
+        fields=fields,
+        row_count=row_count,
+        total_rows=len(dataset),
+        tokens=tokens,
+        is_retrieved=is_retrieved
+    )
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def encode_dataset(dataset_key: str, _dataset, include_authors: bool = True, token_budget: int = DEFAULT_TOKEN_BUDGET):
+    """데이터셋 전체를 인코딩 (데이터셋 키 기준 캐시)"""
+    return encode_rows(_dataset, range(len(_dataset)), include_authors, token_budget)
+
+
+def author_summary(dataset, limit: int = MAX_PROMPT_AUTHORS) -> str:
+    """질문을 많이 한 상위 작성자 이름과 나머지 인원수 (작성자별 질문은 로컬 통계로 답변)"""
+    counts = Counter(author for author in dataset.authors if author)
+    names = ", ".join(name for name, _ in counts.most_common(limit))
+    if len(counts) > limit:
+        return f"{names} 외 {len(counts) - limit}명"
+    return names
+
+
+def data_token_budget(fixed_text: str, query: str, history_budget: int, token_budget: int = DEFAULT_TOKEN_BUDGET) -> int:
+    """전체 예산에서 고정 문구/기초 통계, 이전 대화 예산, 질문 몫을 빼고 데이터 행에 남는 토큰 수"""
+    reserved = (
+        count_tokens(fixed_text) + history_budget
+        + max(count_tokens(query), QUERY_TOKEN_RESERVE) + TOKEN_SAFETY_MARGIN
+    )
+    return max(token_budget - reserved, 0)
+
+
+def log_prompt_size(label: str, messages: list) -> int:
+    """요청별 프롬프트 토큰 수 기록"""
+    tokens = sum(count_tokens(message["content"]) for message in messages)
+    print(f"[prompt] {label}: {tokens} tokens")
+    return tokens
+
+
+def truncation_note(encoded: EncodedData) -> str:
+    """일부 행만 포함되었을 때 프롬프트에 덧붙일 안내 문구"""
+    if encoded.is_retrieved:
+        return f"(전체 {encoded.total_rows}개 중 질문과 관련된 {encoded.row_count}개 질문만 포함되었습니다)"
+    if not encoded.is_truncated:
+        return ""
+    return f"(토큰 제한으로 전체 {encoded.total_rows}개 중 {encoded.row_count}개 질문만 포함되었습니다)"
+
+
+def log_usage(label: str, usage) -> None:
+    """응답의 토큰 사용량 기록 (프롬프트 캐시에서 처리된 토큰 수 포함)"""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    print(
+        f"[usage] {label}: prompt {usage.prompt_tokens} tokens (cached {cached_tokens}), "
+        f"completion {usage.completion_tokens} tokens"
+    )
+
+
+def stream_deltas(stream, label: str):
+    """스트리밍 응답에서 텍스트 조각만 반환 (마지막 사용량 청크는 기록)"""
+    for chunk in stream:
+        if not chunk:
+            continue
+        if getattr(chunk, "usage", None) is not None:
+            log_usage(label, chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
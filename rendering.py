@@ -0,0 +1,47 @@
+import itertools
+import re
+import time
+
+# 스트리밍 답변 화면 갱신 간격 (조각마다 다시 그리지 않고 이 간격으로 모아서 갱신)
+FLUSH_INTERVAL_SECONDS = 0.05
+CURSOR = "▌"
+
+# 완성된 메시지를 보여주는 총 시간(초)과 최대 화면 갱신 횟수 (0초면 바로 표시)
+DEFAULT_REVEAL_SECONDS = 1.0
+REVEAL_MAX_FRAMES = 20
+
+
+def render_stream(placeholder, deltas, interval: float = FLUSH_INTERVAL_SECONDS) -> str:
+    """도착한 조각을 모아 일정 간격으로만 화면 갱신 (고정 대기 없이 네트워크 속도로 표시)"""
+    text = ""
+    pending = []
+    last_flush = 0.0
+    for delta in deltas:
+        pending.append(delta)
+        now = time.monotonic()
+        # 첫 조각은 바로 표시하고, 이후에는 간격이 지났을 때만 갱신
+        if now - last_flush >= interval:
+            text += "".join(pending)
+            pending.clear()
+            placeholder.markdown(text + CURSOR)
+            last_flush = now
+    text += "".join(pending)
+    placeholder.markdown(text)
+    return text
+
+
+def reveal(placeholder, message: str, duration: float = DEFAULT_REVEAL_SECONDS,
+           max_frames: int = REVEAL_MAX_FRAMES):
+    """완성된 메시지를 단어 단위로 정해진 시간 안에 표시 (duration이 0 이하면 바로 표시)"""
+    words = re.findall(r"\s*\S+", message)
+    frames = min(max_frames, len(words))
+    if duration <= 0 or frames <= 1:
+        placeholder.markdown(message)
+        return
+    # 단어 경계 위치 (갱신 횟수가 정해져 있어 메시지 길이와 관계없이 총 시간이 일정)
+    ends = list(itertools.accumulate(len(word) for word in words))
+    delay = duration / frames
+    for frame in range(1, frames):
+        placeholder.markdown(message[:ends[len(words) * frame // frames - 1]] + CURSOR)
+        time.sleep(delay)
+    placeholder.markdown(message)
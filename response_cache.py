@@ -0,0 +1,199 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from contextlib import closing
+
+import retrieval
+
+# LLM 응답을 보관하는 로컬 SQLite 캐시 (데이터셋 + 질문 + 모델 + 프롬프트 버전 기준)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", os.path.join(SCRIPT_DIR, ".response_cache.sqlite3"))
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+CACHE_MAX_ENTRIES = 5000
+
+# 표현만 다른 비슷한 질문을 찾기 위한 해시 벡터 설정 (어절 + 어절 내 문자 2-gram)
+VECTOR_DIM = 1024
+SIMILARITY_THRESHOLD = 0.9
+
+# 유사 질문으로 볼 때 두 질문 사이에 달라도 되는 말 (조사/어미, 요청 표현 등)
+# "많이"/"적게", "빼고"처럼 이 외의 단어가 한쪽에만 있으면 다른 질문으로 취급
+PARTICLE_SUFFIXES = sorted([
+    "은", "는", "이", "가", "을", "를", "의", "에", "에서", "에게", "도", "만", "로", "으로", "와", "과",
+    "이야", "야", "요", "이에요", "예요", "인가요", "인지", "이랑", "랑", "나", "이나", "님", "돼", "입니까",
+], key=len, reverse=True)
+FILLER_WORDS = {"좀", "혹시", "그", "한번", "가장", "제일", "뭐", "뭐야", "뭐지", "뭔가요", "무엇", "무엇인가요", "무엇인지"}
+FILLER_PREFIXES = ("알려", "보여", "말해", "설명해", "정리해")
+
+# 캐시된 답변을 스트리밍 화면으로 다시 보여줄 때의 조각 크기
+REPLAY_CHUNK_SIZE = 20
+
+
+def _connect():
+    conn = sqlite3.connect(CACHE_PATH, timeout=5)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            dataset_key TEXT,
+            query TEXT,
+            model TEXT,
+            prompt_version TEXT,
+            response TEXT,
+            created_at REAL,
+            last_used REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_vectors (
+            key TEXT PRIMARY KEY,
+            scope TEXT,
+            vector BLOB
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_query_vectors_scope ON query_vectors (scope)")
+    return conn
+
+
+def normalize_query(query: str) -> str:
+    """공백/대소문자/끝 문장부호 차이를 없앤 질문"""
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?!.~ ")
+
+
+def make_key(dataset_key: str, query: str, model: str, prompt_version: str) -> str:
+    """캐시 키 생성"""
+    parts = [dataset_key, normalize_query(query), model, prompt_version]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _scope(dataset_key: str, model: str, prompt_version: str) -> str:
+    """유사 질문 검색 범위 (같은 데이터셋, 모델, 프롬프트 버전)"""
+    return hashlib.sha256("\x1f".join([dataset_key, model, prompt_version]).encode("utf-8")).hexdigest()
+
+
+def query_vector(query: str) -> array:
+    """정규화한 질문의 토큰을 해시하여 만든 단위 벡터"""
+    vector = array("f", bytes(4 * VECTOR_DIM))
+    for token in retrieval.tokenize(normalize_query(query)):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % VECTOR_DIM] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm:
+        for idx, value in enumerate(vector):
+            if value:
+                vector[idx] = value / norm
+    return vector
+
+
+def _cosine(left: array, right: array) -> float:
+    return sum(a * b for a, b in zip(left, right) if a)
+
+
+def strip_particles(word: str) -> str:
+    """어절 끝의 조사/어미 제거"""
+    for suffix in PARTICLE_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _content_stems(query: str) -> list:
+    """조사/어미를 떼고 요청 표현을 뺀 내용 단어"""
+    stems = (strip_particles(word) for word in re.findall(r"\w+", normalize_query(query)))
+    return [stem for stem in stems if stem not in FILLER_WORDS and not stem.startswith(FILLER_PREFIXES)]
+
+
+def _similarity_vector(query: str) -> array:
+    """내용 단어로 만든 유사 질문 검색용 벡터 (요청 표현만 다른 질문은 같은 벡터)"""
+    return query_vector(" ".join(_content_stems(query)))
+
+
+def _same_meaning(query: str, cached_query: str) -> bool:
+    """한쪽에만 있는 단어가 조사/어미나 요청 표현뿐인지 확인"""
+    return set(_content_stems(query)) == set(_content_stems(cached_query))
+
+
+def get(key: str):
+    """캐시된 응답 조회 (없거나 만료되었으면 None)"""
+    now = time.time()
+    try:
+        with closing(_connect()) as conn, conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > CACHE_TTL_SECONDS:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.execute("DELETE FROM query_vectors WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return response
+    except sqlite3.Error as e:
+        print(f"Response cache read error: {str(e)}")
+        return None
+
+
+def find_similar(dataset_key: str, query: str, model: str, prompt_version: str, threshold: float = SIMILARITY_THRESHOLD):
+    """같은 데이터셋에서 표현만 다른 비슷한 질문의 캐시된 응답 조회 (없으면 None)"""
+    target = _similarity_vector(query)
+    # "주제 3개"와 "주제 5개"처럼 숫자만 다른 질문은 다른 질문으로 취급
+    numbers = re.findall(r"\d+", normalize_query(query))
+    best_key, best_score = None, threshold
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute("""
+                SELECT query_vectors.key, responses.query, query_vectors.vector
+                FROM query_vectors JOIN responses ON responses.key = query_vectors.key
+                WHERE query_vectors.scope = ?
+            """, (_scope(dataset_key, model, prompt_version),)).fetchall()
+    except sqlite3.Error as e:
+        print(f"Response cache read error: {str(e)}")
+        return None
+
+    for key, cached_query, blob in rows:
+        if re.findall(r"\d+", cached_query) != numbers or not _same_meaning(query, cached_query):
+            continue
+        vector = array("f")
+        vector.frombytes(blob)
+        score = _cosine(target, vector)
+        if score >= best_score:
+            best_key, best_score = key, score
+    if best_key is None:
+        return None
+    return get(best_key)
+
+
+def put(key: str, response: str, dataset_key: str = "", query: str = "", model: str = "", prompt_version: str = ""):
+    """응답 저장 후 오래 사용하지 않은 항목부터 정리"""
+    now = time.time()
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, dataset_key, normalize_query(query), model, prompt_version, response, now, now)
+            )
+            if dataset_key and query:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_vectors VALUES (?, ?, ?)",
+                    (key, _scope(dataset_key, model, prompt_version), _similarity_vector(query).tobytes())
+                )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - CACHE_TTL_SECONDS,))
+            conn.execute("""
+                DELETE FROM responses WHERE key NOT IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT ?
+                )
+            """, (CACHE_MAX_ENTRIES,))
+            conn.execute("DELETE FROM query_vectors WHERE key NOT IN (SELECT key FROM responses)")
+    except sqlite3.Error as e:
+        print(f"Response cache write error: {str(e)}")
+
+
+def replay_chunks(text: str, size: int = REPLAY_CHUNK_SIZE):
+    """캐시된 답변을 스트리밍 응답처럼 조각으로 나눠 반환"""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
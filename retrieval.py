@@ -0,0 +1,82 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import streamlit as st
+
+# 질문과 관련된 데이터만 프롬프트에 포함할 때 선택할 최대 행 수
+DEFAULT_TOP_K = 50
+
+# BM25 파라미터
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 전체 데이터를 봐야 답할 수 있는 질문 (검색 없이 전체 데이터 사용)
+GLOBAL_QUERY_KEYWORDS = [
+    '전체', '모든', '모두', '전반', '가장 많', '많이 나온', '자주', '주제', '요약', '정리',
+    '분류', '카테고리', '통계', '몇 개', '몇개', '몇 명', '몇명', '비율', '순위', '목록', '리스트'
+]
+
+
+def tokenize(text: str) -> list:
+    """어절과 어절 내 문자 2-gram으로 토큰화 (한국어 조사/어미 변화에 강하도록)"""
+    tokens = []
+    for word in re.findall(r"\w+", text.lower()):
+        tokens.append(word)
+        if len(word) > 2:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class LexicalIndex:
+    """질문 목록에 대한 BM25 역색인"""
+
+    def __init__(self, documents):
+        self.size = len(documents)
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+        for doc_id, document in enumerate(documents):
+            term_counts = Counter(tokenize(document))
+            self.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                self.postings[term].append((doc_id, count))
+        self.avg_length = (sum(self.doc_lengths) / self.size) if self.size else 0.0
+
+    def _idf(self, term: str) -> float:
+        doc_freq = len(self.postings.get(term, ()))
+        return math.log(1 + (self.size - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> list:
+        """점수가 높은 순서로 (행 번호, 점수) 목록 반환"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_id, count in postings:
+                norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] += idf * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def build_index(dataset_key: str, _dataset) -> LexicalIndex:
+    """데이터셋 질문으로 검색 색인 생성 (데이터셋 키 기준으로 한 번만 생성)"""
+    return LexicalIndex(_dataset.questions)
+
+
+def is_global_query(query: str) -> bool:
+    """전체 데이터를 대상으로 하는 질문인지 확인"""
+    return any(keyword in query for keyword in GLOBAL_QUERY_KEYWORDS)
+
+
+def select_relevant_rows(index: LexicalIndex, query: str, top_k: int = DEFAULT_TOP_K):
+    """질문과 관련된 행 번호 목록 (전체 데이터가 필요하면 None)"""
+    if is_global_query(query) or index.size <= top_k:
+        return None
+    hits = index.search(query, top_k)
+    if not hits:
+        return None
+    # 원래 순서를 유지해 프롬프트에 포함
+    return sorted(doc_id for doc_id, _ in hits)
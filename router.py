@@ -0,0 +1,109 @@
+import re
+from dataclasses import dataclass
+
+import response_cache
+
+# 질문 유형
+INTENT_STATISTICS = "statistics"
+INTENT_CHART = "chart"
+INTENT_TOPICS = "topics"
+INTENT_FREE_FORM = "free_form"
+
+# 유형별로 사용할 모델 등급 (각 앱에서 등급별 모델 이름 지정)
+MODEL_SMALL = "small"
+MODEL_LARGE = "large"
+
+# 명확한 표현은 패턴으로 먼저 판별 (위에서부터 우선 적용)
+INTENT_PATTERNS = [
+    (INTENT_CHART, re.compile(r"차트|그래프|시각화")),
+    (INTENT_TOPICS, re.compile(
+        r"(많이|자주)\s*나온\s*(주제|질문)|주제별|주요\s*주제|대표적인\s*질문|주로\s*어떤\s*질문|질문\s*리스트|질문들\s*정리"
+    )),
+    (INTENT_STATISTICS, re.compile(
+        r"몇\s*(개|명|건|번)|총\s*(질문|작성자|인원)|개수|인원수|누가\s*.*(가장|제일)\s*많이|(가장|제일)\s*(긴|짧은)\s*질문|평균"
+        r"|작성자\s*(목록|리스트|명단)|명단"
+    )),
+]
+
+# 패턴에 걸리지 않는 질문은 예시 질문과의 유사도로 판별
+INTENT_EXAMPLES = {
+    INTENT_STATISTICS: [
+        "질문이 총 몇 개야",
+        "작성자는 모두 몇 명이야",
+        "누가 질문을 가장 많이 했어",
+        "질문을 제일 많이 한 사람 알려줘",
+        "가장 긴 질문은 뭐야",
+        "작성자 목록 보여줘",
+    ],
+    INTENT_TOPICS: [
+        "가장 많이 나온 주제가 뭐야",
+        "신입사원들이 주로 어떤 질문을 했어",
+        "각 주제의 대표적인 질문들 알려줘",
+        "자주 나온 질문들 정리해줘",
+        "전체 질문을 요약해줘",
+    ],
+    INTENT_CHART: [
+        "질문을 카테고리별로 나눠서 보여줘",
+        "질문 유형 비율 시각화해줘",
+    ],
+}
+CLASSIFIER_THRESHOLD = 0.45
+
+# 자유 질문 중 큰 모델이 필요한 질문 (추론/비교/조언 등)
+COMPLEX_QUERY_PATTERN = re.compile(r"왜|이유|비교|분석|조언|제안|전략|어떻게\s*생각|의견|추천|시사점")
+COMPLEX_QUERY_LENGTH = 60
+
+
+@dataclass(frozen=True)
+class Route:
+    intent: str
+    model: str
+
+
+_example_vectors = None
+
+
+def _classify(query: str):
+    """예시 질문과의 최대 유사도로 유형 판별 (기준 미만이면 None)"""
+    global _example_vectors
+    if _example_vectors is None:
+        _example_vectors = [
+            (intent, response_cache.query_vector(example))
+            for intent, examples in INTENT_EXAMPLES.items()
+            for example in examples
+        ]
+    target = response_cache.query_vector(query)
+    best_intent, best_score = None, CLASSIFIER_THRESHOLD
+    for intent, vector in _example_vectors:
+        score = sum(a * b for a, b in zip(target, vector) if a)
+        if score >= best_score:
+            best_intent, best_score = intent, score
+    return best_intent
+
+
+def classify_intent(query: str, authors=()) -> str:
+    """질문 유형 판별 (패턴 → 조언/이유 등 → 작성자 이름 → 예시 유사도 순서)"""
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(query):
+            return intent
+    # 작성자 이름이 있어도 조언/이유 등을 묻는 질문은 모델이 답변
+    if COMPLEX_QUERY_PATTERN.search(query):
+        return INTENT_FREE_FORM
+    # 특정 작성자의 질문을 묻는 경우
+    if any(author and author in query for author in authors):
+        return INTENT_STATISTICS
+    return _classify(query) or INTENT_FREE_FORM
+
+
+def route_query(query: str, dataset, models: dict) -> Route:
+    """질문 유형에 맞는 처리 경로와 모델 선택"""
+    intent = classify_intent(query, dataset.authors_list)
+    if intent in (INTENT_STATISTICS, INTENT_CHART):
+        tier = MODEL_SMALL
+    elif intent == INTENT_TOPICS:
+        tier = MODEL_LARGE
+    elif len(query) > COMPLEX_QUERY_LENGTH or COMPLEX_QUERY_PATTERN.search(query):
+        tier = MODEL_LARGE
+    else:
+        tier = MODEL_SMALL
+    return Route(intent=intent, model=models[tier])
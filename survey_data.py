@@ -0,0 +1,216 @@
+import hashlib
+import io
+from dataclasses import dataclass
+
+import openpyxl
+import pandas as pd
+import streamlit as st
+
+import dataset_store
+
+# 파싱 결과 캐시 크기 (세션 간 공유, 오래된 항목부터 제거)
+INGEST_CACHE_MAX_ENTRIES = 16
+
+# 이 크기 이상의 파일은 전체를 메모리에 올리지 않고 나눠서 읽음
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+STREAM_CHUNK_ROWS = 5000
+SAMPLE_ROWS = 200
+
+NO_AUTHOR_COLUMN = "(없음)"
+
+
+@dataclass(frozen=True)
+class SurveyDataset:
+    """작성자/질문 컬럼을 배열 형태로 보관하는 분석용 데이터셋"""
+    key: str
+    authors: tuple
+    questions: tuple
+    # 차트 분류 결과 (질문별 카테고리, 분류 전에는 비어 있음)
+    categories: tuple = ()
+    labels: tuple = ()
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.questions)
+
+    @property
+    def authors_list(self) -> list:
+        """중복 제거 후 정렬된 작성자 목록"""
+        return sorted(set(author for author in self.authors if author))
+
+    @property
+    def author_count(self) -> int:
+        return len(self.authors_list)
+
+    @property
+    def text_data(self) -> str:
+        """분석용 텍스트 데이터 (빈 질문 제외)"""
+        return '\n'.join(question for question in self.questions if question)
+
+    def to_frame(self):
+        """저장소 기록용 DataFrame"""
+        return pd.DataFrame({"author": list(self.authors), "question": list(self.questions)})
+
+    @classmethod
+    def from_frame(cls, key: str, df):
+        return cls(
+            key=key,
+            authors=tuple(df["author"].tolist()),
+            questions=tuple(df["question"].tolist())
+        )
+
+
+def dataset_key(file_hash: str, author_col: str, question_col: str) -> str:
+    """파일 해시와 선택 컬럼으로 데이터셋 식별자 생성"""
+    return hashlib.sha256(f"{file_hash}:{author_col}:{question_col}".encode("utf-8")).hexdigest()
+
+
+def file_digest(file_bytes: bytes) -> str:
+    """업로드 파일 내용의 해시값 계산"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner=False)
+def read_table(file_hash: str, file_name: str, _file_bytes: bytes):
+    """파일 내용을 DataFrame으로 파싱 (file_hash 기준 캐시, 디스크 저장소 우선)"""
+    df = dataset_store.load_frame(file_hash)
+    if df is not None:
+        return df
+
+    buffer = io.BytesIO(_file_bytes)
+    if file_name.endswith('.csv'):
+        df = pd.read_csv(buffer)
+    else:
+        df = pd.read_excel(buffer)
+    dataset_store.save_frame(file_hash, df)
+    return df
+
+
+def _iter_xlsx_chunks(file_bytes: bytes, usecols, chunk_rows: int):
+    """openpyxl read-only 모드로 첫 번째 시트를 행 단위로 읽기"""
+    workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {idx}" for idx, col in enumerate(header)]
+        if usecols is None:
+            indices = list(range(len(columns)))
+        else:
+            indices = [columns.index(col) for col in usecols]
+        selected = [columns[idx] for idx in indices]
+        total_rows = sheet.max_row or 0
+
+        batch = []
+        blank_rows = 0
+        row_count = 0
+        for row in rows:
+            row_count += 1
+            # 빈 행은 뒤에 데이터가 이어질 때만 포함 (pandas와 동일하게 끝부분 빈 행 제거)
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            batch.extend([(None,) * len(indices)] * blank_rows)
+            blank_rows = 0
+            batch.append(tuple(row[idx] if idx < len(row) else None for idx in indices))
+            if len(batch) >= chunk_rows:
+                progress = min(row_count / total_rows, 1.0) if total_rows else 0.0
+                yield pd.DataFrame(batch, columns=selected), progress
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=selected), 1.0
+    finally:
+        workbook.close()
+
+
+def iter_table_chunks(file_name: str, file_bytes: bytes, usecols=None, chunk_rows: int = STREAM_CHUNK_ROWS):
+    """파일을 chunk_rows 행 단위 DataFrame으로 순차 파싱 (진행률 0~1과 함께 반환)"""
+    if file_name.endswith('.csv'):
+        buffer = io.BytesIO(file_bytes)
+        total_bytes = len(file_bytes) or 1
+        with pd.read_csv(buffer, usecols=usecols, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield chunk, min(buffer.tell() / total_bytes, 1.0)
+    else:
+        yield from _iter_xlsx_chunks(file_bytes, usecols, chunk_rows)
+
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner=False)
+def read_sample(file_hash: str, file_name: str, _file_bytes: bytes, nrows: int = SAMPLE_ROWS):
+    """파일 앞부분 nrows 행만 파싱 (컬럼 확인용)"""
+    for chunk, _ in iter_table_chunks(file_name, _file_bytes, chunk_rows=nrows):
+        return chunk
+    return pd.DataFrame()
+
+
+def text_columns(df) -> list:
+    """텍스트 컬럼 목록 (pandas 버전에 따라 object 또는 문자열 dtype)"""
+    return [
+        col for col in df.columns
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])
+    ]
+
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner=False)
+def sniff_text_columns(file_hash: str, file_name: str, _file_bytes: bytes) -> list:
+    """헤더와 앞부분 표본만 읽어 텍스트 컬럼 목록 추론"""
+    sample = read_sample(file_hash, file_name, _file_bytes)
+    candidates = set(text_columns(sample))
+    # 표본 구간이 모두 비어 있는 컬럼은 판단을 보류하고 후보로 포함
+    return [col for col in sample.columns if col in candidates or sample[col].isna().all()]
+
+
+def _text_column(df, col):
+    """결측값을 빈 문자열로 바꾼 문자열 배열"""
+    return tuple(df[col].fillna("").astype(str).tolist())
+
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_dataset(file_hash: str, file_name: str, author_col: str, question_col: str, _file_bytes: bytes):
+    """선택된 컬럼으로 분석용 데이터셋 생성 (file_hash + 컬럼 기준 캐시)"""
+    key = dataset_key(file_hash, author_col, question_col)
+    stored = dataset_store.load_frame(key)
+    if stored is not None:
+        return SurveyDataset.from_frame(key, stored)
+
+    df = read_table(file_hash, file_name, _file_bytes)
+
+    questions = _text_column(df, question_col)
+    if author_col != NO_AUTHOR_COLUMN:
+        authors = _text_column(df, author_col)
+    else:
+        authors = ("",) * len(questions)
+
+    dataset = SurveyDataset(key=key, authors=authors, questions=questions)
+    dataset_store.save_frame(key, dataset.to_frame())
+    return dataset
+
+
+def stream_dataset(file_hash: str, file_name: str, author_col: str, question_col: str, file_bytes: bytes, on_progress=None):
+    """대용량 파일을 나눠 읽으며 데이터셋 생성 (필요한 컬럼만 유지)"""
+    key = dataset_key(file_hash, author_col, question_col)
+    stored = dataset_store.load_frame(key)
+    if stored is not None:
+        return SurveyDataset.from_frame(key, stored)
+
+    usecols = [question_col] if author_col == NO_AUTHOR_COLUMN else [author_col, question_col]
+    authors = []
+    questions = []
+    for chunk, progress in iter_table_chunks(file_name, file_bytes, usecols=usecols):
+        chunk_questions = _text_column(chunk, question_col)
+        questions.extend(chunk_questions)
+        if author_col != NO_AUTHOR_COLUMN:
+            authors.extend(_text_column(chunk, author_col))
+        else:
+            authors.extend(("",) * len(chunk_questions))
+        if on_progress:
+            on_progress(progress)
+
+    dataset = SurveyDataset(key=key, authors=tuple(authors), questions=tuple(questions))
+    dataset_store.save_frame(key, dataset.to_frame())
+    return dataset
@@ -0,0 +1,178 @@
+import re
+from collections import Counter
+
+import prompting
+import response_cache
+
+# 목록형 답변에서 보여줄 기본 개수 (질문에 숫자가 있으면 그 숫자 사용)
+DEFAULT_TOP_N = 5
+DEFAULT_LONGEST_N = 3
+MAX_LIST_ROWS = 30
+
+# 통계 질문 유형별 표현
+TOTAL_PATTERN = re.compile(r"몇\s*개|개수|총\s*(질문|문항)|질문\s*수")
+AUTHOR_COUNT_PATTERN = re.compile(r"몇\s*명|작성자\s*수|인원|총\s*(작성자|인원)")
+AUTHOR_LIST_PATTERN = re.compile(r"작성자\s*(목록|리스트|명단)|명단|누가\s*있")
+TOP_AUTHOR_PATTERN = re.compile(r"(가장|제일)\s*많이|많이\s*(한|물어본|질문한)|상위|순위")
+LONGEST_PATTERN = re.compile(r"(가장|제일)\s*긴|긴\s*질문")
+SHORTEST_PATTERN = re.compile(r"(가장|제일)\s*짧은|짧은\s*질문")
+AVERAGE_PATTERN = re.compile(r"평균")
+
+# 계산 결과를 문장으로 다듬어 달라는 요청 (이 경우에만 모델 사용)
+PHRASING_PATTERN = re.compile(r"자연스럽게|문장으로|풀어서|설명해|요약해")
+
+NO_AUTHOR_MESSAGE = "작성자 정보가 없는 데이터입니다."
+
+# 통계 표현과 함께 쓰여도 질문 범위를 바꾸지 않는 말 (조사/어미를 뗀 뒤 비교하고, 이 외의 단어가 있으면 특정 내용으로 좁힌 질문으로 보고 모델에 넘김)
+STOP_WORD_PREFIXES = (
+    "질문", "작성자", "사람", "인원", "전체", "모두", "개수", "목록", "리스트", "명단", "순위", "문항", "길이",
+    "알려", "보여", "말해", "정리", "계산", "뭐", "무엇", "누구", "누가", "얼마", "몇", "데이터", "파일",
+    "신입", "사원", "CEO", "ceo", "혹시", "각각", "있어", "있나", "있는", "있니", "있을", "했어", "했나", "했는",
+    "했던", "했니", "해줘", "해주", "주세요", "줄래", "대해", "대한", "관련",
+)
+STOP_WORDS = {
+    "총", "수", "한", "명", "개", "건", "다", "좀", "각", "중", "제일", "가장", "그", "해", "하는", "인가", "별", "줘",
+    "어떻게", "어떤", "무슨",
+}
+
+
+def _requested_count(query: str, default: int) -> int:
+    """질문에 포함된 개수 (없으면 기본값)"""
+    match = re.search(r"(\d+)\s*(개|명|건|위)", query)
+    return max(1, min(int(match.group(1)), MAX_LIST_ROWS)) if match else default
+
+
+def _question_lines(questions: list) -> list:
+    return [f"{number}. {question}" for number, question in enumerate(questions, 1)]
+
+
+def _mentioned_authors(query: str, dataset) -> list:
+    """질문에 이름이 나온 작성자 (긴 이름 우선, 다른 이름에 포함된 이름은 제외)"""
+    found = []
+    for author in sorted(dataset.authors_list, key=len, reverse=True):
+        if author in query and not any(author in name for name in found):
+            found.append(author)
+    return found
+
+
+def _content_terms(query: str, authors: list) -> list:
+    """통계 표현, 작성자 이름, 개수, 불용어를 뺀 나머지 단어"""
+    text = query
+    for pattern in (
+        TOTAL_PATTERN, AUTHOR_COUNT_PATTERN, AUTHOR_LIST_PATTERN, TOP_AUTHOR_PATTERN,
+        LONGEST_PATTERN, SHORTEST_PATTERN, AVERAGE_PATTERN, PHRASING_PATTERN
+    ):
+        text = pattern.sub(" ", text)
+    for author in authors:
+        text = text.replace(author, " ")
+    text = re.sub(r"\d+\s*(개|명|건|위|번)?", " ", text)
+    terms = []
+    for word in re.findall(r"[가-힣A-Za-z]+", text):
+        # 통계 표현이나 이름을 지우고 남은 조사/어미("이영희가" → "가")는 내용 단어가 아님
+        stem = response_cache.strip_particles(word)
+        if stem in response_cache.PARTICLE_SUFFIXES or stem in STOP_WORDS or word.startswith(STOP_WORD_PREFIXES):
+            continue
+        terms.append(word)
+    return terms
+
+
+def _author_questions(dataset, author: str) -> list:
+    return [
+        question.strip()
+        for name, question in zip(dataset.authors, dataset.questions)
+        if name == author and question.strip()
+    ]
+
+
+def answer(query: str, dataset):
+    """데이터셋에서 바로 계산한 통계 답변 (이해하지 못한 질문이나 내용 조건이 붙은 질문이면 None)"""
+    # "연봉 관련 질문은 몇 개야?"처럼 내용으로 범위를 좁힌 질문은 전체 통계로 답하지 않음
+    authors = _mentioned_authors(query, dataset)
+    if _content_terms(query, authors):
+        return None
+
+    lines = []
+    has_authors = dataset.author_count > 0
+    questions = [question.strip() for question in dataset.questions if question.strip()]
+
+    # 특정 작성자의 질문
+    for author in authors:
+        author_questions = _author_questions(dataset, author)
+        lines.append(f"#### {author}님의 질문 ({len(author_questions)}개)")
+        lines += _question_lines(author_questions[:MAX_LIST_ROWS])
+        if len(author_questions) > MAX_LIST_ROWS:
+            lines.append(f"\n외 {len(author_questions) - MAX_LIST_ROWS}개")
+        lines.append("")
+
+    if not authors and TOTAL_PATTERN.search(query):
+        lines.append(f"- 총 질문 수: {dataset.total_questions}개")
+
+    if AUTHOR_COUNT_PATTERN.search(query):
+        lines.append(f"- 총 작성자 수: {dataset.author_count}명" if has_authors else NO_AUTHOR_MESSAGE)
+
+    if AUTHOR_LIST_PATTERN.search(query):
+        if has_authors:
+            lines.append(f"- 작성자 목록 ({dataset.author_count}명): {', '.join(dataset.authors_list)}")
+        else:
+            lines.append(NO_AUTHOR_MESSAGE)
+
+    if not authors and TOP_AUTHOR_PATTERN.search(query):
+        if has_authors:
+            counts = Counter(
+                name for name, question in zip(dataset.authors, dataset.questions) if name and question.strip()
+            )
+            top_n = _requested_count(query, DEFAULT_TOP_N)
+            lines.append("#### 질문을 가장 많이 한 작성자")
+            lines += [
+                f"{number}. {name}: {count}개"
+                for number, (name, count) in enumerate(counts.most_common(top_n), 1)
+            ]
+        else:
+            lines.append(NO_AUTHOR_MESSAGE)
+
+    if LONGEST_PATTERN.search(query):
+        longest = sorted(questions, key=len, reverse=True)[:_requested_count(query, DEFAULT_LONGEST_N)]
+        lines.append("#### 가장 긴 질문")
+        lines += [f"{number}. {question} ({len(question)}자)" for number, question in enumerate(longest, 1)]
+
+    if SHORTEST_PATTERN.search(query):
+        shortest = sorted(questions, key=len)[:_requested_count(query, DEFAULT_LONGEST_N)]
+        lines.append("#### 가장 짧은 질문")
+        lines += [f"{number}. {question} ({len(question)}자)" for number, question in enumerate(shortest, 1)]
+
+    if AVERAGE_PATTERN.search(query) and questions:
+        average_length = sum(len(question) for question in questions) / len(questions)
+        lines.append(f"- 질문 평균 길이: {average_length:.1f}자")
+        if has_authors:
+            lines.append(f"- 작성자 1명당 평균 질문 수: {len(questions) / dataset.author_count:.1f}개")
+
+    if not lines:
+        return None
+    return '\n'.join(lines).strip()
+
+
+def wants_phrasing(query: str) -> bool:
+    """계산 결과를 모델이 문장으로 다듬어야 하는 질문인지 확인"""
+    return bool(PHRASING_PATTERN.search(query))
+
+
+def build_phrasing_messages(query: str, facts: str) -> list:
+    """로컬 계산 결과를 자연스러운 문장으로 다듬는 메시지 생성 (데이터 원문은 보내지 않음)"""
+    prompt = f"""
+    아래는 신입사원 질문 데이터에서 직접 계산한 결과입니다.
+
+    계산 결과:
+{facts}
+
+    질문: {query}
+
+    규칙:
+    1. 계산 결과의 숫자와 이름을 바꾸지 말고 그대로 사용하세요
+    2. 계산 결과에 없는 내용은 절대 추측하지 마세요
+    """
+    messages = [
+        {"role": "system", "content": "당신은 데이터 분석 전문가입니다."},
+        {"role": "user", "content": prompt}
+    ]
+    prompting.log_prompt_size("statistics", messages)
+    return messages
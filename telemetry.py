@@ -0,0 +1,211 @@
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+import llm_client
+
+# 단계별 소요 시간 히스토그램 구간(초)과 백분위 계산에 쓰는 최근 측정값 수
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SAMPLES = 1000
+METRIC_NAME = "shcard_ceo_bot_stage_duration_seconds"
+
+# Prometheus 텍스트 파일 경로 (textfile collector 등에서 수집, 비어 있으면 기록하지 않음)
+METRICS_PATH = os.environ.get("METRICS_PATH", "")
+METRICS_WRITE_INTERVAL_SECONDS = 10.0
+
+_lock = threading.Lock()
+_histograms = {}
+_last_written = 0.0
+# 현재 요청에서 기록 중인 구간 목록 (trace 안에서만 사용)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_depth = contextvars.ContextVar("span_depth", default=0)
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+
+def record(stage: str, seconds: float, started_at: float = None):
+    """단계별 소요 시간 기록 (여러 세션/스레드에서 공유)"""
+    with _lock:
+        _histograms.setdefault(stage, _Histogram()).observe(seconds)
+    spans = _current_trace.get()
+    if spans is not None:
+        start = started_at if started_at is not None else time.perf_counter() - seconds
+        spans.append({"stage": stage, "seconds": round(seconds, 4), "depth": _depth.get(), "start": start})
+    _write_metrics_file()
+
+
+@contextmanager
+def span(stage: str):
+    """with 블록의 소요 시간을 stage 이름으로 기록"""
+    token = _depth.set(_depth.get() + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        record(stage, time.perf_counter() - start, start)
+
+
+def traced(stage: str):
+    """함수 실행 시간을 stage 이름으로 기록하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(stage: str):
+    """요청 하나의 구간 기록 시작 (끝나면 디버그 패널용으로 세션에 저장)"""
+    spans = []
+    token = _current_trace.set(spans)
+    try:
+        with span(stage):
+            yield spans
+    finally:
+        _current_trace.reset(token)
+        # 안쪽 구간이 먼저 끝나므로 시작 시각 순서로 정렬해서 저장
+        st.session_state.telemetry_trace = sorted(spans, key=lambda item: item["start"])
+
+
+def timed_stream(deltas, stage: str, started_at: float):
+    """스트리밍 응답의 첫 조각까지 시간(_first_token)과 전체 시간 기록"""
+    first = True
+    for delta in deltas:
+        if first:
+            record(f"{stage}_first_token", time.perf_counter() - started_at, started_at)
+            first = False
+        yield delta
+    record(f"{stage}_stream", time.perf_counter() - started_at, started_at)
+
+
+def _percentile(values: list, ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+def summary() -> list:
+    """단계별 호출 수와 최근 측정값 기준 p50/p95"""
+    with _lock:
+        snapshot = {stage: (hist.count, list(hist.recent)) for stage, hist in _histograms.items()}
+    return [
+        {
+            "stage": stage,
+            "count": count,
+            "p50": round(_percentile(recent, 0.5), 4),
+            "p95": round(_percentile(recent, 0.95), 4)
+        }
+        for stage, (count, recent) in sorted(snapshot.items())
+        if recent
+    ]
+
+
+def export_prometheus() -> str:
+    """Prometheus 텍스트 형식의 히스토그램"""
+    lines = [
+        f"# HELP {METRIC_NAME} Duration of each app stage.",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    with _lock:
+        for stage, hist in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BUCKETS, hist.buckets):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {hist.total:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
+
+
+def _write_metrics_file():
+    """METRICS_PATH가 지정된 경우 일정 간격으로 메트릭 파일 갱신"""
+    global _last_written
+    if not METRICS_PATH:
+        return
+    now = time.monotonic()
+    with _lock:
+        if now - _last_written < METRICS_WRITE_INTERVAL_SECONDS:
+            return
+        _last_written = now
+    try:
+        tmp_path = f"{METRICS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(export_prometheus())
+        os.replace(tmp_path, METRICS_PATH)
+    except OSError as e:
+        print(f"Metrics file write error: {str(e)}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@st.cache_resource
+def start_metrics_server(port: int):
+    """/metrics 조회용 HTTP 서버를 프로세스에서 한 번만 시작"""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics server: http://0.0.0.0:{port}/metrics")
+    return server
+
+
+def setup():
+    """secrets 설정에 따라 메트릭 서버 시작 (metrics_port)"""
+    port = int(llm_client.secret("metrics_port", 0))
+    if port:
+        try:
+            start_metrics_server(port)
+        except OSError as e:
+            print(f"Metrics server error: {str(e)}")
+
+
+def render_debug_panel():
+    """사이드바 디버그 패널 (secrets의 debug_panel이 true일 때만 표시)"""
+    if not llm_client.secret("debug_panel", False):
+        return
+    with st.expander("⏱️ 단계별 처리 시간"):
+        rows = summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        last_trace = st.session_state.get("telemetry_trace")
+        if last_trace:
+            st.markdown("**마지막 요청**")
+            st.text("\n".join(
+                f"{'  ' * (item['depth'] - 1)}{item['stage']}: {item['seconds'] * 1000:.1f} ms"
+                for item in last_trace
+            ))
@@ -0,0 +1,15 @@
+import categorize
+
+
+def test_array_stream_waits_for_number_to_finish():
+    stream = categorize.JsonArrayStream("values")
+    assert stream.feed('{"values": [1, 3.') == [1]
+    assert stream.feed("14, 5]") == [3.14, 5]
+    assert stream.done
+
+
+def test_array_stream_returns_strings_as_they_complete():
+    stream = categorize.JsonArrayStream("categories")
+    assert stream.feed('{"categories": ["회사 비전", "조직') == ["회사 비전"]
+    assert stream.feed(' 문화"]}') == ["조직 문화"]
+    assert stream.done
@@ -0,0 +1,45 @@
+import importlib
+
+import pytest
+
+import conversation
+import prompting
+import survey_data
+
+ROWS = 20000
+AUTHORS = 8000
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    topics = ["복지", "휴가", "교육", "디지털", "조직 문화", "리더십", "보안", "결제"]
+    return survey_data.SurveyDataset(
+        key="prompt-budget-test",
+        authors=tuple(f"사원{idx % AUTHORS:05d}" for idx in range(ROWS)),
+        questions=tuple(f"{topics[idx % len(topics)]} 제도에 대해 CEO님은 어떻게 생각하시나요? ({idx})" for idx in range(ROWS))
+    )
+
+
+@pytest.fixture(scope="module")
+def history():
+    messages = []
+    for idx in range(20):
+        messages.append({"role": "human", "message": f"이전 질문 {idx} " + "복지 제도 " * 200})
+        messages.append({"role": "assistant", "message": f"이전 답변 {idx} " + "휴가 제도 " * 300})
+    return messages
+
+
+@pytest.mark.parametrize("variant", ["ceo_2", "ceo_3", "ceo_4"])
+@pytest.mark.parametrize("query", ["전체 질문을 요약해줘", "복지 제도에 대한 질문 알려줘"])
+def test_general_messages_stay_within_budget(monkeypatch, dataset, history, variant, query):
+    monkeypatch.setenv("LLM_BASE_URL", "http://127.0.0.1:9/v1")
+    module = importlib.import_module(variant)
+    recent = conversation.build_history(history, query, module.HISTORY_TOKEN_BUDGET)
+
+    messages = module.build_general_messages(query, dataset, recent)
+
+    tokens = sum(prompting.count_tokens(message["content"]) for message in messages)
+    assert tokens <= module.PROMPT_TOKEN_BUDGET
+    if variant != "ceo_2":
+        # 작성자 이름은 질문 수 상위 일부만 포함
+        assert f"외 {AUTHORS - prompting.MAX_PROMPT_AUTHORS}명" in messages[0]["content"]
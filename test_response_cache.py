@@ -0,0 +1,47 @@
+import pytest
+
+import response_cache
+
+DATASET_KEY = "dataset"
+MODEL = "gpt-4o-mini"
+PROMPT_VERSION = "test"
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+
+
+def _put(query: str, response: str):
+    key = response_cache.make_key(DATASET_KEY, query, MODEL, PROMPT_VERSION)
+    response_cache.put(key, response, DATASET_KEY, query, MODEL, PROMPT_VERSION)
+
+
+def _find(query: str):
+    return response_cache.find_similar(DATASET_KEY, query, MODEL, PROMPT_VERSION)
+
+
+@pytest.mark.parametrize("cached_query, query", [
+    ("가장 많이 나온 주제가 뭐야?", "가장 적게 나온 주제가 뭐야?"),
+    ("복지 관련 질문 알려줘", "복지 관련 질문 빼고 알려줘"),
+    ("많이 나온 주제 3개 알려줘", "많이 나온 주제 5개 알려줘"),
+    ("가장 많이 나온 주제 알려줘", "가장 적게 나온 주제 알려줘"),
+    ("가장 많이 나온 주제가 뭐야?", "가장 많이 나온 질문이 뭐야?"),
+    ("복지 관련 질문 알려줘", "휴가 관련 질문 보여줘"),
+])
+def test_different_questions_are_not_served(cached_query, query):
+    _put(cached_query, "cached")
+    assert _find(query) is None
+
+
+@pytest.mark.parametrize("cached_query, query", [
+    ("가장 많이 나온 주제가 뭐야?", "가장 많이 나온 주제는 뭐야"),
+    ("복지 관련 질문 알려줘", "복지 관련 질문 좀 알려줘"),
+    ("가장 많이 나온 주제가 뭐야?", "가장 많이 나온 주제 알려줘"),
+    ("가장 많이 나온 주제가 뭐야?", "많이 나온 주제 알려줘"),
+    ("복지 관련 질문 알려줘", "복지 관련 질문 보여줘"),
+    ("작성자 목록 보여줘", "작성자 목록을 알려줘"),
+])
+def test_paraphrased_questions_are_served(cached_query, query):
+    _put(cached_query, "cached")
+    assert _find(query) == "cached"
@@ -0,0 +1,35 @@
+import pytest
+
+import survey_data
+import survey_stats
+
+DATASET = survey_data.SurveyDataset(
+    key="survey-stats-test",
+    authors=("김철수", "이영희", "박민수", "김철수"),
+    questions=("연봉 인상 계획이 있나요?", "복지 제도는 어떤가요?", "회사 비전은 무엇인가요?", "커리어 성장 방법이 궁금합니다.")
+)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("질문이 총 몇 개야", "총 질문 수: 4개"),
+    ("질문이 몇 개나 돼?", "총 질문 수: 4개"),
+    ("질문은 모두 몇 개입니까?", "총 질문 수: 4개"),
+    ("질문 수를 문장으로 알려줘", "총 질문 수: 4개"),
+    ("작성자 수가 어떻게 돼?", "총 작성자 수: 3명"),
+    ("이영희가 한 질문 보여줘", "이영희님의 질문 (1개)"),
+    ("김철수님은 어떤 질문을 했어?", "김철수님의 질문 (2개)"),
+    ("작성자 목록 보여줘", "작성자 목록 (3명)"),
+])
+def test_answers_statistics_locally(query, expected):
+    result = survey_stats.answer(query, DATASET)
+    assert result is not None and expected in result
+
+
+@pytest.mark.parametrize("query", [
+    "연봉 관련 질문은 몇 개야?",
+    "복지에 대해 질문한 사람은 몇 명이야?",
+    "평균 연봉에 대한 질문이 있어?",
+    "김철수 질문에 대해 CEO 입장에서 조언해줘",
+])
+def test_leaves_filtered_questions_to_model(query):
+    assert survey_stats.answer(query, DATASET) is None
@@ -0,0 +1,167 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+import categorize
+import prompting
+
+# 주요 주제 설정
+TOPIC_COUNT = 3
+QUESTIONS_PER_TOPIC = 3
+JOB_TIMEOUT_SECONDS = 120
+# 실패한 데이터셋의 재시도 대기 시간 (실패할 때마다 두 배, 최대 1시간)
+RETRY_BACKOFF_SECONDS = 60
+RETRY_BACKOFF_MAX_SECONDS = 3600
+
+# 미리 계산한 결과로 답변하는 질문 유형
+# 유형 1: "신입사원의 질문을 기반으로 가장 많이 나온 주제 3개를 출력해줘"와 유사한 질문
+TOPIC_KEYWORDS = ['많이 나온 주제', '주로 어떤 질문', '주요 주제', '자주 나온 주제']
+# 유형 2: "방금 출력해준 3가지 주제별로 가장 많이 나온 질문 3개씩 출력해줘"와 유사한 질문
+TOPIC_QUESTION_KEYWORDS = ['주제별', '대표적인 질문', '자주 나온 질문', '질문 리스트', '질문들 정리']
+
+_executor = ThreadPoolExecutor(max_workers=2)
+
+
+@st.cache_resource
+def _jobs() -> dict:
+    """데이터셋 키별 주제 계산 작업 (세션 간 공유)"""
+    return {}
+
+
+@st.cache_resource
+def _failures() -> dict:
+    """데이터셋 키별 (연속 실패 횟수, 마지막 실패 시각)"""
+    return {}
+
+
+def _record_failure(dataset_key: str, job):
+    """실패한 작업을 제거하고 재시도 대기 시간 계산에 쓸 실패 기록 갱신 (작업당 한 번만)"""
+    if _jobs().get(dataset_key) is not job:
+        return
+    _jobs().pop(dataset_key, None)
+    count, _ = _failures().get(dataset_key, (0, 0.0))
+    _failures()[dataset_key] = (count + 1, time.monotonic())
+
+
+def _in_backoff(dataset_key: str) -> bool:
+    """최근에 실패해서 아직 다시 시도하지 않을 데이터셋인지 확인"""
+    failure = _failures().get(dataset_key)
+    if failure is None:
+        return False
+    count, failed_at = failure
+    delay = min(RETRY_BACKOFF_SECONDS * 2 ** (count - 1), RETRY_BACKOFF_MAX_SECONDS)
+    return time.monotonic() - failed_at < delay
+
+
+def compute_topics(client, model: str, system_prompt: str, dataset, token_budget: int) -> list:
+    """가장 많이 나온 주제와 주제별 대표 질문 계산"""
+    row_ids = [idx for idx, question in enumerate(dataset.questions) if question.strip()]
+    encoded = prompting.encode_rows(dataset, row_ids, include_authors=False, token_budget=token_budget)
+
+    prompt = f"""
+    아래는 신한카드 신입사원들이 CEO에게 한 질문입니다.
+    가장 많이 나온 주제 {TOPIC_COUNT}개를 많이 나온 순서대로 찾고, 주제별 대표 질문 번호를 {QUESTIONS_PER_TOPIC}개씩 골라주세요.
+
+    데이터 (한 줄에 질문 하나, 탭으로 구분):
+{encoded.text}
+
+    다음과 같은 JSON 형식으로 반환해주세요:
+    {{"topics": [{{"title": "주제 이름", "summary": "주제에 대한 한 문장 설명", "question_ids": [1, 2, 3]}}]}}
+
+    규칙:
+    1. 대표 질문은 유사한 질문이 중복되지 않게 골라주세요
+    2. 데이터에 없는 내용은 절대 추측하지 마세요
+    3. JSON 형식 외의 다른 텍스트는 포함하지 마세요
+    """
+    result = categorize.request_json(
+        client, model, system_prompt, prompt, "topics",
+        validate=lambda result: isinstance(result.get("topics"), list),
+        schema='{"topics": [{"title": "주제 이름", "summary": "주제 설명", "question_ids": [1, 2, 3]}]}'
+    )
+
+    topics = []
+    for topic in result.get("topics", [])[:TOPIC_COUNT]:
+        questions = []
+        for question_id in topic.get("question_ids", []):
+            try:
+                row_id = int(question_id) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= row_id < len(dataset) and dataset.questions[row_id].strip():
+                questions.append(dataset.questions[row_id].strip())
+        topics.append({
+            "title": str(topic.get("title", "")).strip(),
+            "summary": str(topic.get("summary", "")).strip(),
+            "questions": list(dict.fromkeys(questions))[:QUESTIONS_PER_TOPIC]
+        })
+    return topics
+
+
+def start_topic_job(client, model: str, system_prompt: str, dataset, token_budget: int):
+    """업로드 시 주제 계산을 백그라운드로 시작 (데이터셋마다 한 번만 실행, 실패하면 대기 후 재시도)"""
+    jobs = _jobs()
+    job = jobs.get(dataset.key)
+    if job is not None and job.done() and job.exception() is not None:
+        print(f"Topic job error: {str(job.exception())}")
+        _record_failure(dataset.key, job)
+    if dataset.key not in jobs:
+        if _in_backoff(dataset.key):
+            return None
+        # 사용량 장부의 세션/데이터셋 정보가 작업 스레드에도 전달되도록 컨텍스트 복사
+        jobs[dataset.key] = _executor.submit(
+            contextvars.copy_context().run, compute_topics, client, model, system_prompt, dataset, token_budget
+        )
+    return jobs[dataset.key]
+
+
+def get_topics(dataset_key: str):
+    """계산된 주제 반환 (작업이 진행 중이면 완료될 때까지 대기, 없거나 실패하면 None)"""
+    job = _jobs().get(dataset_key)
+    if job is None:
+        return None
+    try:
+        topics = job.result(timeout=JOB_TIMEOUT_SECONDS) or None
+    except Exception as e:
+        # 대기 시간만 초과한 작업은 계속 진행되도록 두고, 실제로 실패한 작업만 제거
+        if not job.done():
+            print(f"Topic job still running after {JOB_TIMEOUT_SECONDS}s")
+            return None
+        print(f"Topic job error: {str(e)}")
+        _record_failure(dataset_key, job)
+        return None
+    _failures().pop(dataset_key, None)
+    return topics
+
+
+def detect_intent(query: str):
+    """미리 계산한 결과로 답할 수 있는 질문 유형 (1: 주요 주제, 2: 주제별 대표 질문, 해당 없으면 None)"""
+    if any(keyword in query for keyword in TOPIC_QUESTION_KEYWORDS):
+        return 2
+    if any(keyword in query for keyword in TOPIC_KEYWORDS):
+        return 1
+    return None
+
+
+def format_answer(topics: list, intent: int) -> str:
+    """질문 유형에 맞는 답변 작성"""
+    if intent == 1:
+        lines = ["신입사원들의 질문을 분석한 결과, 가장 많이 나온 주제는 다음과 같습니다:", ""]
+        for number, topic in enumerate(topics, 1):
+            lines.append(f"## {number}. {topic['title']}")
+            examples = ", ".join(f'"{question}"' for question in topic["questions"])
+            summary = topic["summary"]
+            if examples:
+                summary += f" 예를 들어, {examples} 등의 질문이 이에 해당합니다."
+            lines += [summary, ""]
+        lines.append(f"이 {len(topics)}가지 주제는 신입사원들이 CEO와의 소통을 통해 얻고자 하는 주요 관심사로 나타났습니다.")
+        return "\n".join(lines)
+
+    lines = ["아래는 신입사원들의 질문을 주제별로 정리한 결과입니다. 유사한 질문은 중복 제거하였으며, 질문자의 이름은 가렸습니다.", ""]
+    for number, topic in enumerate(topics, 1):
+        lines.append(f"## {number}. {topic['title']}")
+        lines += [f"{idx}. {question}" for idx, question in enumerate(topic["questions"], 1)]
+        lines.append("")
+    lines.append("이와 같은 질문들은 신입사원들이 CEO에게 궁금해하는 다양한 측면을 반영하고 있습니다.")
+    return "\n".join(lines)
@@ -0,0 +1,161 @@
+import argparse
+import contextvars
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+import streamlit as st
+
+# API 호출별 토큰 사용량/지연 시간/예상 비용을 기록하는 로컬 SQLite 장부
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LEDGER_PATH = os.environ.get("USAGE_LEDGER_PATH", os.path.join(SCRIPT_DIR, ".usage_ledger.sqlite3"))
+
+# 모델별 100만 토큰당 가격(USD): (입력, 캐시된 입력, 출력)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# 모델을 호출하지 않고 로컬에서 계산한 답변(통계, 미리 계산한 주제)을 기록할 때의 모델 이름
+LOCAL_MODEL = "local"
+
+# 집계 기준 (컬럼 이름과 같은 이름의 뷰)
+GROUP_COLUMNS = ("session_id", "dataset_key", "intent", "model")
+
+# 호출을 기록할 때 함께 저장할 세션/데이터셋/질문 유형 (요청 처리 중에만 설정)
+_context = contextvars.ContextVar("usage_context", default={})
+
+
+def _connect():
+    conn = sqlite3.connect(LEDGER_PATH, timeout=5)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL,
+            session_id TEXT,
+            dataset_key TEXT,
+            intent TEXT,
+            model TEXT,
+            prompt_tokens INTEGER,
+            cached_tokens INTEGER,
+            completion_tokens INTEGER,
+            latency_seconds REAL,
+            cost_usd REAL,
+            cache_hit INTEGER
+        )
+    """)
+    for column in GROUP_COLUMNS:
+        conn.execute(f"""
+            CREATE VIEW IF NOT EXISTS usage_by_{column} AS
+            SELECT {column},
+                   COUNT(*) AS calls,
+                   SUM(cache_hit) AS cache_hits,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(cached_tokens) AS cached_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   ROUND(SUM(cost_usd), 6) AS cost_usd,
+                   ROUND(AVG(CASE WHEN cache_hit = 0 THEN latency_seconds END), 3) AS avg_latency_seconds
+            FROM calls
+            GROUP BY {column}
+        """)
+    return conn
+
+
+def session_id() -> str:
+    """브라우저 세션별 식별자"""
+    if "usage_session_id" not in st.session_state:
+        st.session_state.usage_session_id = uuid.uuid4().hex
+    return st.session_state.usage_session_id
+
+
+@contextmanager
+def context(**fields):
+    """with 블록 안에서 발생한 호출에 세션/데이터셋/질문 유형 정보 연결"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def estimate_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """모델 가격표 기준 예상 비용 (가격을 모르는 모델은 0)"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # 날짜가 붙은 모델 이름(gpt-4o-2024-08-06 등)은 가장 긴 접두사로 찾음
+        matches = [name for name in MODEL_PRICES if model.startswith(name)]
+        prices = MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0, 0.0)
+    input_price, cached_price, output_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+def record(model: str, prompt_tokens: int = 0, cached_tokens: int = 0, completion_tokens: int = 0,
+           latency_seconds: float = 0.0, cache_hit: bool = False):
+    """호출 한 건 기록 (기록 실패는 응답에 영향을 주지 않음)"""
+    fields = _context.get()
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO calls (created_at, session_id, dataset_key, intent, model, prompt_tokens, cached_tokens,
+                                   completion_tokens, latency_seconds, cost_usd, cache_hit)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    time.time(), fields.get("session_id", ""), fields.get("dataset_key", ""), fields.get("intent", ""),
+                    model, prompt_tokens, cached_tokens, completion_tokens, latency_seconds,
+                    estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens), int(cache_hit)
+                )
+            )
+    except sqlite3.Error as e:
+        print(f"Usage ledger write error: {str(e)}")
+
+
+def record_usage(model: str, usage, latency_seconds: float):
+    """API 응답의 usage 객체 기록 (스트리밍에서 usage를 요청하지 않았으면 토큰 수는 0)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    record(
+        model,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        latency_seconds=latency_seconds
+    )
+
+
+def summary(by: str = "dataset_key") -> list:
+    """기준별 호출 수, 토큰 수, 예상 비용, 평균 지연 시간 (비용이 큰 순서)"""
+    if by not in GROUP_COLUMNS:
+        raise ValueError(f"집계 기준은 {', '.join(GROUP_COLUMNS)} 중 하나여야 합니다.")
+    try:
+        with closing(_connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f"SELECT * FROM usage_by_{by} ORDER BY cost_usd DESC").fetchall()
+    except sqlite3.Error as e:
+        print(f"Usage ledger read error: {str(e)}")
+        return []
+    return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 사용량/비용 집계")
+    parser.add_argument("--by", default="dataset_key", choices=GROUP_COLUMNS)
+    args = parser.parse_args()
+    rows = summary(args.by)
+    if not rows:
+        print("기록된 호출이 없습니다.")
+        return
+    columns = list(rows[0].keys())
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if row[column] is None else str(row[column]) for column in columns))
+
+
+if __name__ == "__main__":
+    main()